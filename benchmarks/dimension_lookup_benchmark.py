@@ -0,0 +1,65 @@
+'''
+Time and peak memory of attaching product_category and loyalty_score with two DataFrame merges
+versus the DimensionLookup hash index used by merge_dataframes
+cmd to run it (from the repository root): python -m benchmarks.dimension_lookup_benchmark
+'''
+
+# importing libraries
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.typed_schema_memory_benchmark import build_frames
+from solution import solution_start
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='dimension lookup benchmark')
+    parser.add_argument('--customers', required=False, type=int, default=100000)
+    parser.add_argument('--days', required=False, type=int, default=182)
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def legacy_merge_dataframes(product_df : pd.DataFrame, customer_df : pd.DataFrame, transaction_df : pd.DataFrame) -> pd.DataFrame:
+    '''
+    The original implementation with two left merges
+    '''
+    intermediate_df : pd.DataFrame = transaction_df.merge(product_df[["product_id", "product_category"]], on="product_id", how="left")
+    return intermediate_df.merge(customer_df[["customer_id", "loyalty_score"]], on="customer_id", how="left")
+
+
+def measure(function, *args) -> tuple:
+    '''
+    Wall time of an untraced call and peak allocated memory of a second, traced call
+    '''
+    start : float = time.perf_counter()
+    result = function(*args)
+    seconds : float = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = function(*args)
+    peak : int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 1024 / 1024
+
+
+def main():
+    params : dict = get_params()
+    customer_df, product_df, transaction_df = build_frames(params['customers'], params['days'], params['seed'])
+    print(f"{len(customer_df)} customers, {len(transaction_df)} basket items")
+
+    legacy_df, legacy_seconds, legacy_peak = measure(legacy_merge_dataframes, product_df, customer_df, transaction_df)
+    del legacy_df
+    final_df, seconds, peak = measure(solution_start.merge_dataframes, product_df, customer_df, transaction_df)
+
+    print(f"{'implementation':<18} {'time (s)':>9} {'peak allocated (MB)':>20}")
+    print(f"{'two merges':<18} {legacy_seconds:>9.2f} {legacy_peak:>20.1f}")
+    print(f"{'DimensionLookup':<18} {seconds:>9.2f} {peak:>20.1f}")
+    print(f"same result: {final_df.equals(legacy_merge_dataframes(product_df, customer_df, transaction_df))}")
+
+
+if __name__ == "__main__":
+    main()
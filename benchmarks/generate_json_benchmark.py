@@ -0,0 +1,97 @@
+'''
+Benchmark comparing the original row-wise generate_json loop with the grouped aggregation path
+cmd to run it (from the repository root): python -m benchmarks.generate_json_benchmark
+'''
+
+# importing libraries
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from solution import solution_start
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='generate_json benchmark')
+    parser.add_argument('--customers', required=False, type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--rows_per_customer', required=False, type=int, default=3)
+    parser.add_argument('--legacy_max_customers', required=False, type=int, default=10000,
+                        help='skip the original loop above this many customers (it is O(customers x rows))')
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def build_weekly_df(number_of_customers : int, rows_per_customer : int, seed : int) -> pd.DataFrame:
+    '''
+    Build a synthetic weekly dataframe shaped like the output of merge_dataframes
+    '''
+    rng = np.random.default_rng(seed)
+    rows : int = number_of_customers * rows_per_customer
+    customer_numbers : np.ndarray = rng.integers(1, number_of_customers + 1, size=rows)
+    product_numbers : np.ndarray = rng.integers(1, 65, size=rows)
+    categories : np.ndarray = np.array(['house', 'clothes', 'fruit_veg', 'sweets', 'food', 'bws'], dtype=object)
+    return pd.DataFrame({
+        'customer_id': np.char.add('C', customer_numbers.astype(str)).astype(object),
+        'date_of_purchase': pd.Timestamp('2018-12-02'),
+        'product_id': np.char.add('P', np.char.zfill(product_numbers.astype(str), 2)).astype(object),
+        'price': rng.integers(1, 2001, size=rows),
+        'product_category': categories[product_numbers % len(categories)],
+        'loyalty_score': (customer_numbers % 10) + 1
+    })
+
+
+def legacy_generate_json(df : pd.DataFrame, name : str, params : dict):
+    '''
+    The original per-customer filter and iterrows() implementation of generate_json
+    '''
+    customers : list = solution_start.sorted_alphanumeric_Ids(list(df['customer_id'].unique()))
+    output_dict : dict = {}
+    for customer in customers:
+        output_dict[customer] = {}
+        output_dict[customer]['purchase_count'] = 0
+        for idx, row in df[df['customer_id'] == customer].iterrows():
+            output_dict[customer]['loyalty_score'] = row['loyalty_score']
+            if 'product_id' in output_dict[customer]:
+                output_dict[customer]['product_id'].append(row['product_id'])
+                output_dict[customer]['purchase_count'] += 1
+            else:
+                output_dict[customer]['product_id'] = []
+            if 'product_category' in output_dict[customer]:
+                output_dict[customer]['product_category'].append(row['product_category'])
+            else:
+                output_dict[customer]['product_category'] = []
+    with open(str(params['output_location']) + 'Week_' + str(name).split(' ')[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(output_dict, f, ensure_ascii=False, indent=4)
+
+
+def time_call(function, *args) -> float:
+    start : float = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    params : dict = get_params()
+    print(f"{'customers':>10} {'rows':>10} {'legacy (s)':>12} {'grouped (s)':>12} {'speedup':>9} {'identical':>10}")
+    for number_of_customers in params['customers']:
+        df : pd.DataFrame = build_weekly_df(number_of_customers, params['rows_per_customer'], params['seed'])
+        with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as grouped_dir:
+            grouped_seconds : float = time_call(solution_start.generate_json, df, '2018-12-02', {'output_location': grouped_dir + '/'})
+            if number_of_customers <= params['legacy_max_customers']:
+                legacy_seconds : float = time_call(legacy_generate_json, df, '2018-12-02', {'output_location': legacy_dir + '/'})
+                with open(os.path.join(legacy_dir, 'Week_2018-12-02.json'), 'rb') as legacy_file, \
+                        open(os.path.join(grouped_dir, 'Week_2018-12-02.json'), 'rb') as grouped_file:
+                    identical : str = str(legacy_file.read() == grouped_file.read())
+                print(f"{number_of_customers:>10} {len(df):>10} {legacy_seconds:>12.2f} {grouped_seconds:>12.2f} "
+                      f"{legacy_seconds / grouped_seconds:>8.1f}x {identical:>10}")
+            else:
+                print(f"{number_of_customers:>10} {len(df):>10} {'skipped':>12} {grouped_seconds:>12.2f} {'-':>9} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+'''
+Peak RSS benchmark of the in-memory and streaming (chunked) transaction ingestion over a generated six-month dataset
+cmd to run it (from the repository root): python -m benchmarks.ingestion_memory_benchmark
+'''
+
+# importing libraries
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from inputs_data_generator.main_data_generator import generate_dataset
+
+ROOT : str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='ingestion memory benchmark')
+    parser.add_argument('--data_location', required=False, default=None, help='existing dataset, generated when not given')
+    parser.add_argument('--customers', required=False, type=int, default=10000)
+    parser.add_argument('--chunk_sizes', required=False, type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def run_pipeline(data_location : str, output_location : str, extra_args : list) -> tuple:
+    '''
+    Run solution_start.main in a fresh process and return its wall time and peak RSS in MB
+    '''
+    code : str = ('import resource, sys\n'
+                  'from solution import solution_start\n'
+                  'solution_start.main()\n'
+                  'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n')
+    args : list = [sys.executable, '-c', code,
+                   '--customers_location', os.path.join(data_location, 'customers.csv'),
+                   '--products_location', os.path.join(data_location, 'products.csv'),
+                   '--transactions_location', os.path.join(data_location, 'transactions') + '/',
+                   '--output_location', output_location + '/'] + extra_args
+    start : float = time.perf_counter()
+    # running inside the output directory so the run's ./logs does not touch the repository
+    result = subprocess.run(args, cwd=output_location, env=dict(os.environ, PYTHONPATH=ROOT),
+                            check=True, capture_output=True, text=True)
+    return time.perf_counter() - start, int(result.stdout.split()[-1]) / 1024
+
+
+def main():
+    params : dict = get_params()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_location : str = params['data_location'] or os.path.join(temp_dir, 'data')
+        if params['data_location'] is None:
+            print(f"generating six months of data for {params['customers']} customers ...")
+            generate_dataset(data_location, params['customers'], datetime(2018, 12, 1), datetime(2019, 5, 31, 23, 59, 59), seed=params['seed'])
+
+        size_mb : float = sum(os.path.getsize(os.path.join(folder, name))
+                              for folder, _, names in os.walk(os.path.join(data_location, 'transactions')) for name in names) / 1024 / 1024
+        print(f"transactions input: {size_mb:.1f} MB")
+
+        modes : list = [('in-memory', [])] + [(f'streaming chunk_size={size}', ['--chunk_size', str(size)]) for size in params['chunk_sizes']]
+        print(f"{'mode':<30} {'time (s)':>10} {'peak RSS (MB)':>15}")
+        for name, extra_args in modes:
+            output_location : str = tempfile.mkdtemp(dir=temp_dir)
+            seconds, peak_mb = run_pipeline(data_location, output_location, extra_args)
+            print(f"{name:<30} {seconds:>10.2f} {peak_mb:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
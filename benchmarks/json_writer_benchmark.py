@@ -0,0 +1,62 @@
+'''
+Throughput of the weekly JSON writer modes: pretty (default), compact, orjson and gzip
+cmd to run it (from the repository root): python -m benchmarks.json_writer_benchmark
+'''
+
+# importing libraries
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.generate_json_benchmark import build_weekly_df
+from solution import solution_start
+
+MODES : list = [
+    ('pretty json (default)', {}),
+    ('compact json', {'compact_json': True}),
+    ('compact orjson', {'compact_json': True, 'json_encoder': 'orjson'}),
+    ('pretty json + gzip', {'gzip_output': True}),
+    ('compact orjson + gzip', {'compact_json': True, 'json_encoder': 'orjson', 'gzip_output': True})
+]
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='JSON writer benchmark')
+    parser.add_argument('--customers', required=False, type=int, default=200000)
+    parser.add_argument('--rows_per_customer', required=False, type=int, default=3)
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def main():
+    params : dict = get_params()
+    df : pd.DataFrame = build_weekly_df(params['customers'], params['rows_per_customer'], params['seed'])
+    if solution_start.orjson is None:
+        print('orjson is not installed, orjson modes use the json encoder')
+
+    # records are built once so the timings only cover encoding and writing
+    records : list = list(solution_start.aggregate_customers(df))
+
+    print(f"{len(records)} customers, {len(df)} rows")
+    print(f"{'mode':<24} {'time (s)':>9} {'file (MB)':>10} {'JSON MB/s':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # throughput is measured on the uncompressed JSON of the same layout (gzip modes run after it)
+        uncompressed_mb : dict = {}
+        for name, options in MODES:
+            path : str = os.path.join(temp_dir, solution_start.week_file_name('2018-12-02', options))
+            start : float = time.perf_counter()
+            solution_start.write_json_output(iter(records), path, options)
+            seconds : float = time.perf_counter() - start
+            file_mb : float = os.path.getsize(path) / 1024 / 1024
+            layout : str = 'compact' if options.get('compact_json') else 'pretty'
+            if not options.get('gzip_output'):
+                uncompressed_mb[layout] = file_mb
+            logical_mb : float = uncompressed_mb[layout]
+            print(f"{name:<24} {seconds:>9.2f} {file_mb:>10.1f} {logical_mb / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
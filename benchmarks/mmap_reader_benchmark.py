@@ -0,0 +1,98 @@
+'''
+Peak RSS and throughput of the transactions.json readers on one large single-day partition:
+whole file read().splitlines() (original reader), line iteration (current default) and --mmap.
+On a 200 MB partition line iteration and --mmap peak at about the same RSS, both well below read().splitlines()
+cmd to run it (from the repository root): python -m benchmarks.mmap_reader_benchmark --size_mb 2048
+'''
+
+# importing libraries
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from inputs_data_generator.main_data_generator import generate_dataset
+
+ROOT : str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# each reader parses the partition in chunks and only counts the rows, printing rows and peak RSS
+READERS : dict = {
+    'read().splitlines()': ('lines = open(path).read().splitlines()\n'
+                            'for start in range(0, len(lines), chunk_size):\n'
+                            '    rows += len(solution_start.parse_transaction_lines([line for line in lines[start:start + chunk_size] if line.strip()]))\n'),
+    'line iterator': ('for chunk in solution_start.iter_transaction_chunks(["d=2019-01-01"], params):\n'
+                      '    rows += len(chunk)\n'),
+    'mmap': ('for chunk in solution_start.iter_transaction_chunks(["d=2019-01-01"], dict(params, mmap=True)):\n'
+             '    rows += len(chunk)\n'),
+}
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='mmap reader benchmark')
+    parser.add_argument('--size_mb', required=False, type=int, default=1024, help='size of the generated transactions.json')
+    parser.add_argument('--chunk_size', required=False, type=int, default=100000)
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def build_partition(location : str, size_mb : int, seed : int) -> str:
+    '''
+    Write a d=2019-01-01/transactions.json of about size_mb by repeating generated transactions
+
+            Parameters:
+                    location (str): root of the transactions directory to create
+                    size_mb (int): target file size in MB
+                    seed (int): generator seed
+
+            Returns:
+                    transactions_location (str): directory containing the d=2019-01-01 partition
+    '''
+
+    generate_dataset(os.path.join(location, 'sample'), 2000, datetime(2018, 12, 1), datetime(2018, 12, 28, 23, 59, 59), seed=seed, method='vectorized')
+    sample : bytes = b''.join(open(os.path.join(folder, name), 'rb').read()
+                              for folder, _, names in os.walk(os.path.join(location, 'sample', 'transactions')) for name in names)
+    transactions_location : str = os.path.join(location, 'transactions')
+    os.makedirs(os.path.join(transactions_location, 'd=2019-01-01'))
+    with open(os.path.join(transactions_location, 'd=2019-01-01', 'transactions.json'), 'wb') as f:
+        for _ in range(max(1, size_mb * 1024 * 1024 // len(sample))):
+            f.write(sample)
+    return transactions_location + '/'
+
+
+def run_reader(reader : str, transactions_location : str, chunk_size : int) -> tuple:
+    '''
+    Run a reader in a fresh process and return its wall time, rows and peak RSS in MB
+    '''
+    code : str = ('import resource, sys\n'
+                  'from solution import solution_start\n'
+                  f'params = {{"transactions_location": {transactions_location!r}, "chunk_size": {chunk_size}}}\n'
+                  f'path = {transactions_location + "d=2019-01-01/transactions.json"!r}\n'
+                  f'chunk_size = {chunk_size}\n'
+                  'rows = 0\n'
+                  + READERS[reader] +
+                  'print(rows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n')
+    start : float = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=dict(os.environ, PYTHONPATH=ROOT),
+                            check=True, capture_output=True, text=True)
+    rows, max_rss = result.stdout.split()[-2:]
+    return time.perf_counter() - start, int(rows), int(max_rss) / 1024
+
+
+def main():
+    params : dict = get_params()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"writing a {params['size_mb']} MB single-day partition ...")
+        transactions_location : str = build_partition(temp_dir, params['size_mb'], params['seed'])
+        size_mb : float = os.path.getsize(transactions_location + 'd=2019-01-01/transactions.json') / 1024 / 1024
+
+        print(f"{'reader':<22} {'time (s)':>10} {'MB/s':>8} {'rows':>12} {'peak RSS (MB)':>15}")
+        for reader in READERS:
+            seconds, rows, peak_mb = run_reader(reader, transactions_location, params['chunk_size'])
+            print(f"{reader:<22} {seconds:>10.2f} {size_mb / seconds:>8.1f} {rows:>12} {peak_mb:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+'''
+Benchmark of sorted_alphanumeric_Ids against the original regex-key sort, sorting the customers of
+every weekly file of a run (each week a random subset of the same customer ids)
+cmd to run it (from the repository root): python -m benchmarks.natural_sort_benchmark
+'''
+
+# importing libraries
+import argparse
+import re
+import time
+
+import numpy as np
+
+from solution import solution_start
+
+
+def legacy_sorted_alphanumeric_Ids(customers : list) -> list:
+    '''
+    sorted_alphanumeric_Ids as it was before the parsed keys cache
+    '''
+    convert = lambda text: int(text) if text.isdigit() else text
+    alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
+    return sorted(customers, key = alphanum_key)
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='natural sort benchmark')
+    parser.add_argument('--customers', required=False, type=int, default=1000000)
+    parser.add_argument('--weeks', required=False, type=int, default=10)
+    parser.add_argument('--active', required=False, type=float, default=0.6, help='share of the customers in each weekly file')
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def main():
+    params : dict = get_params()
+    rng : np.random.Generator = np.random.default_rng(params['seed'])
+    ids : np.ndarray = np.array([f"C{number}" for number in range(1, params['customers'] + 1)], dtype=object)
+    weeks : list = [ids[rng.random(len(ids)) < params['active']].tolist() for _ in range(params['weeks'])]
+    for week in weeks:
+        rng.shuffle(week)
+
+    print(f"{'week':>5} {'customers':>10} {'legacy (s)':>11} {'cached (s)':>11}")
+    totals : list = [0.0, 0.0]
+    for number, week in enumerate(weeks, 1):
+        start : float = time.perf_counter()
+        expected : list = legacy_sorted_alphanumeric_Ids(week)
+        legacy_seconds : float = time.perf_counter() - start
+        start = time.perf_counter()
+        result : list = solution_start.sorted_alphanumeric_Ids(week)
+        seconds : float = time.perf_counter() - start
+        assert result == expected
+        totals = [totals[0] + legacy_seconds, totals[1] + seconds]
+        print(f"{number:>5} {len(week):>10} {legacy_seconds:>11.3f} {seconds:>11.3f}")
+    print(f"{'total':>16} {totals[0]:>11.3f} {totals[1]:>11.3f}   {totals[0] / totals[1]:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+'''
+Scaling benchmark of read_transaction_json_files with 1, 2, 4 and 8 worker processes on generated data
+cmd to run it (from the repository root): python -m benchmarks.parallel_ingestion_benchmark
+'''
+
+# importing libraries
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from inputs_data_generator.main_data_generator import generate_dataset
+from solution import solution_start
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='parallel ingestion benchmark')
+    parser.add_argument('--data_location', required=False, default=None, help='existing dataset, generated when not given')
+    parser.add_argument('--customers', required=False, type=int, default=10000)
+    parser.add_argument('--workers', required=False, type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def main():
+    params : dict = get_params()
+    print(f"cpu cores available: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_location : str = params['data_location'] or temp_dir
+        if params['data_location'] is None:
+            print(f"generating three months of data for {params['customers']} customers ...")
+            generate_dataset(data_location, params['customers'], datetime(2018, 12, 1), datetime(2019, 3, 1, 23, 59, 59), seed=params['seed'])
+
+        transactions_location : str = os.path.join(data_location, 'transactions') + '/'
+        transaction_dirs : list = sorted(os.listdir(transactions_location))
+        transactions : int = 0
+        for transaction in transaction_dirs:
+            with open(transactions_location + transaction + '/transactions.json') as f:
+                transactions += sum(1 for _ in f)
+
+        reference = None
+        print(f"{'workers':>8} {'time (s)':>10} {'transactions/s':>16} {'speedup':>9} {'same output':>12}")
+        for workers in params['workers']:
+            start : float = time.perf_counter()
+            transaction_df = solution_start.read_transaction_json_files(transaction_dirs, {'transactions_location': transactions_location, 'workers': workers})
+            seconds : float = time.perf_counter() - start
+            if reference is None:
+                reference, reference_seconds = transaction_df, seconds
+            print(f"{workers:>8} {seconds:>10.2f} {transactions / seconds:>16.0f} {reference_seconds / seconds:>8.2f}x {str(transaction_df.equals(reference)):>12}")
+
+
+if __name__ == "__main__":
+    main()
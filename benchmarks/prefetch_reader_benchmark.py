@@ -0,0 +1,69 @@
+'''
+Throughput of the prefetching partition reader against storage with slow opens, simulated by a
+file layer sleeping before every open, at 0, 5 and 50 ms of latency
+cmd to run it (from the repository root): python -m benchmarks.prefetch_reader_benchmark
+'''
+
+# importing libraries
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from inputs_data_generator.main_data_generator import generate_dataset
+from solution import solution_start
+
+
+class SlowFileLayer(object):
+    '''
+    Stand-in for open() adding a fixed latency to every open, like network-mounted storage
+    '''
+
+    def __init__(self, latency_seconds : float):
+        self.latency_seconds : float = latency_seconds
+        self.opened : int = 0
+
+    def __call__(self, path : str, mode : str = 'r'):
+        time.sleep(self.latency_seconds)
+        self.opened += 1
+        return open(path, mode)
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='prefetch reader benchmark')
+    parser.add_argument('--data_location', required=False, default=None, help='existing dataset, generated when not given')
+    parser.add_argument('--customers', required=False, type=int, default=1000)
+    parser.add_argument('--latencies_ms', required=False, type=int, nargs='+', default=[0, 5, 50])
+    parser.add_argument('--prefetch', required=False, type=int, nargs='+', default=[1, 4, 16], help='files in flight, 1 reads strictly one after another')
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def main():
+    params : dict = get_params()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_location : str = params['data_location'] or os.path.join(temp_dir, 'data')
+        if params['data_location'] is None:
+            print(f"generating a year of data for {params['customers']} customers ...")
+            generate_dataset(data_location, params['customers'], datetime(2018, 1, 1), datetime(2018, 12, 31, 23, 59, 59), seed=params['seed'], method='vectorized')
+
+        transactions_location : str = os.path.join(data_location, 'transactions') + '/'
+        transaction_dirs : list = sorted(os.listdir(transactions_location))
+        print(f"{len(transaction_dirs)} partitions")
+
+        print(f"{'latency (ms)':>12} {'prefetch':>9} {'time (s)':>10} {'partitions/s':>13} {'speedup':>8}")
+        for latency_ms in params['latencies_ms']:
+            sequential : float = None
+            for prefetch in params['prefetch']:
+                opener : SlowFileLayer = SlowFileLayer(latency_ms / 1000)
+                start : float = time.perf_counter()
+                rows : int = sum(len(chunk) for chunk in solution_start.iter_prefetched_partitions(
+                    transaction_dirs, {'transactions_location': transactions_location, 'prefetch': prefetch}, opener))
+                seconds : float = time.perf_counter() - start
+                sequential = sequential or seconds
+                print(f"{latency_ms:>12} {prefetch:>9} {seconds:>10.2f} {len(transaction_dirs) / seconds:>13.1f} {sequential / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+'''
+Micro-benchmark of separate_column_elements against the original explode + apply(pd.Series) flattening
+cmd to run it (from the repository root): python -m benchmarks.separate_column_elements_benchmark
+'''
+
+# importing libraries
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from solution import solution_start
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='separate_column_elements benchmark')
+    parser.add_argument('--basket_items', required=False, type=int, default=1000000)
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def build_raw_df(basket_items : int, seed : int) -> pd.DataFrame:
+    '''
+    Build a parsed raw transactions dataframe holding basket_items items in baskets of 1 to 3
+    '''
+    rng = np.random.default_rng(seed)
+    sizes : np.ndarray = rng.integers(1, 4, size=basket_items)
+    sizes = sizes[np.cumsum(sizes) <= basket_items]
+    sizes = np.append(sizes, basket_items - sizes.sum()) if sizes.sum() < basket_items else sizes
+    products : list = [f"P{number:02d}" for number in rng.integers(1, 65, size=basket_items)]
+    prices : list = rng.integers(1, 2001, size=basket_items).tolist()
+    baskets : list = []
+    position : int = 0
+    for size in sizes.tolist():
+        baskets.append([{'product_id': products[i], 'price': prices[i]} for i in range(position, position + size)])
+        position += size
+    return pd.DataFrame({
+        'customer_id': [f"C{number}" for number in rng.integers(1, 100001, size=len(baskets))],
+        'basket': baskets,
+        'date_of_purchase': '2018-12-01 15:50:00'
+    })
+
+
+def legacy_separate_column_elements(transaction_raw_df : pd.DataFrame) -> pd.DataFrame:
+    '''
+    The original explode + apply(pd.Series) implementation
+    '''
+    intermediate_df : pd.DataFrame = transaction_raw_df.explode('basket').reset_index(drop=True)
+    temp_df : pd.DataFrame = intermediate_df['basket'].apply(pd.Series)
+    intermediate_df[["product_id", "price"]] = temp_df
+    return intermediate_df.drop(['basket'], axis=1)
+
+
+def main():
+    params : dict = get_params()
+    raw_df : pd.DataFrame = build_raw_df(params['basket_items'], params['seed'])
+    print(f"{len(raw_df)} transactions, {params['basket_items']} basket items")
+
+    start : float = time.perf_counter()
+    legacy_df : pd.DataFrame = legacy_separate_column_elements(raw_df.copy())
+    legacy_seconds : float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transaction_df : pd.DataFrame = solution_start.separate_column_elements(raw_df.copy())
+    seconds : float = time.perf_counter() - start
+
+    print(f"explode + apply(pd.Series): {legacy_seconds:.2f} s")
+    print(f"flat arrays + repeat index: {seconds:.2f} s ({legacy_seconds / seconds:.1f}x faster)")
+    print(f"same values: {legacy_df.astype(str).equals(transaction_df.astype(str))}")
+
+
+if __name__ == "__main__":
+    main()
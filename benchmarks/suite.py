@@ -0,0 +1,201 @@
+'''
+Benchmark suite over fixed-seed small/medium/large datasets: times every pipeline stage and the end-to-end
+solution_start.main, records throughput and peak memory as JSON and fails when a result regresses beyond
+a threshold versus a stored baseline
+cmd to run it (from the repository root): python -m benchmarks.suite --tiers small medium
+cmd to store a new baseline: python -m benchmarks.suite --tiers small medium --update_baseline
+'''
+
+# importing libraries
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from inputs_data_generator.main_data_generator import generate_dataset
+from benchmarks.ingestion_memory_benchmark import run_pipeline
+
+BENCHMARKS_DIR : str = os.path.dirname(os.path.abspath(__file__))
+
+# customers and weeks of data per tier, all generated from the same start date and seed
+TIERS : dict = {
+    'small': {'customers': 1000, 'weeks': 4},
+    'medium': {'customers': 10000, 'weeks': 13},
+    'large': {'customers': 100000, 'weeks': 26},
+}
+
+# stages quicker than this in the baseline are too noisy to compare
+MIN_COMPARED_SECONDS : float = 0.5
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='benchmark suite')
+    parser.add_argument('--tiers', required=False, nargs='+', choices=list(TIERS), default=['small', 'medium'])
+    parser.add_argument('--data_location', required=False, default=None, help='directory keeping generated tiers between runs, a temporary one when not given')
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    parser.add_argument('--repeat', required=False, type=int, default=3, help='runs per tier, the fastest one is kept')
+    parser.add_argument('--pipeline_args', required=False, nargs=argparse.REMAINDER, default=[], help='extra solution_start arguments, e.g. --chunk_size 100000')
+    parser.add_argument('--results_location', required=False, default=os.path.join(BENCHMARKS_DIR, 'results.json'))
+    parser.add_argument('--baseline_location', required=False, default=os.path.join(BENCHMARKS_DIR, 'baseline.json'))
+    parser.add_argument('--threshold', required=False, type=float, default=0.2, help='allowed relative regression, 0.2 means 20%%')
+    parser.add_argument('--update_baseline', required=False, action='store_true', help='store these results as the new baseline instead of comparing')
+    return vars(parser.parse_args())
+
+
+def prepare_tier(data_location : str, tier : str, seed : int) -> str:
+    '''
+    Generate the dataset of a tier under data_location unless it is already there
+
+            Parameters:
+                    data_location (str): root directory of the generated tiers
+                    tier (str): name of the tier in TIERS
+                    seed (int): generator seed
+
+            Returns:
+                    tier_location (str): directory holding customers.csv, products.csv and transactions/
+    '''
+
+    tier_location : str = os.path.join(data_location, f"{tier}-seed{seed}")
+    if not os.path.isfile(os.path.join(tier_location, 'customers.csv')):
+        start_date : datetime = datetime(2018, 12, 3)
+        end_date : datetime = start_date + timedelta(weeks=TIERS[tier]['weeks'], seconds=-1)
+        print(f"generating {tier} tier: {TIERS[tier]['customers']} customers, {TIERS[tier]['weeks']} weeks ...")
+        generate_dataset(tier_location, TIERS[tier]['customers'], start_date, end_date, seed=seed, method='vectorized')
+    return tier_location
+
+
+def count_transactions(tier_location : str) -> int:
+    count : int = 0
+    for folder, _, names in os.walk(os.path.join(tier_location, 'transactions')):
+        for name in names:
+            with open(os.path.join(folder, name), 'rb') as f:
+                count += sum(1 for line in f if line.strip())
+    return count
+
+
+def summarise_report(report : dict, transactions : int) -> dict:
+    '''
+    Reduce a solution_start run report to the benchmark metrics of a run
+
+            Parameters:
+                    report (dict): content of _run_report.json
+                    transactions (int): number of transactions in the input
+
+            Returns:
+                    result (dict): end-to-end time, throughput, peak memory and per stage totals
+    '''
+
+    stages : dict = {}
+    for metrics in report['stages']:
+        stage : dict = stages.setdefault(metrics['stage'], {'calls': 0, 'wall_seconds': 0.0, 'rows_in': 0})
+        stage['calls'] += 1
+        stage['wall_seconds'] = round(stage['wall_seconds'] + metrics['wall_seconds'], 6)
+        stage['rows_in'] += metrics['rows_in'] or 0
+    return {
+        'transactions': transactions,
+        'wall_seconds': report['wall_seconds'],
+        'transactions_per_second': round(transactions / report['wall_seconds'], 1) if report['wall_seconds'] else None,
+        'max_rss_mb': report['max_rss_mb'],
+        'stages': stages
+    }
+
+
+def run_tier(tier_location : str, repeat : int, pipeline_args : list) -> dict:
+    transactions : int = count_transactions(tier_location)
+    runs : list = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for _ in range(repeat):
+            output_location : str = tempfile.mkdtemp(dir=temp_dir)
+            report_location : str = os.path.join(output_location, '_run_report.json')
+            run_pipeline(tier_location, output_location, pipeline_args + ['--report_location', report_location])
+            with open(report_location) as f:
+                runs.append(summarise_report(json.load(f), transactions))
+    # fastest run for the timings, highest peak memory seen in any of them
+    result : dict = min(runs, key=lambda run: run['wall_seconds'])
+    result['max_rss_mb'] = max(run['max_rss_mb'] for run in runs)
+    return result
+
+
+def find_regressions(results : dict, baseline : dict, threshold : float) -> list:
+    '''
+    Compare benchmark results to a baseline
+
+            Parameters:
+                    results (dict): tier name to result of run_tier
+                    baseline (dict): the same structure from a previous run
+                    threshold (float): allowed relative regression
+
+            Returns:
+                    regressions (list): one message per metric worse than baseline by more than threshold
+    '''
+
+    regressions : list = []
+
+    def check(name : str, value : float, reference : float, higher_is_better : bool = False):
+        if value is None or not reference:
+            return
+        change : float = (reference - value) / reference if higher_is_better else (value - reference) / reference
+        if change > threshold:
+            regressions.append(f"{name}: {value} vs baseline {reference} ({change:+.0%})")
+
+    for tier, result in results.items():
+        if tier not in baseline:
+            continue
+        reference : dict = baseline[tier]
+        check(f"{tier} wall_seconds", result['wall_seconds'], reference['wall_seconds'])
+        check(f"{tier} transactions_per_second", result['transactions_per_second'], reference['transactions_per_second'], higher_is_better=True)
+        check(f"{tier} max_rss_mb", result['max_rss_mb'], reference['max_rss_mb'])
+        for stage, metrics in result['stages'].items():
+            reference_stage : dict = reference['stages'].get(stage)
+            if reference_stage and reference_stage['wall_seconds'] >= MIN_COMPARED_SECONDS:
+                check(f"{tier} {stage} wall_seconds", metrics['wall_seconds'], reference_stage['wall_seconds'])
+    return regressions
+
+
+def main():
+    params : dict = get_params()
+    results : dict = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_location : str = params['data_location'] or temp_dir
+        for tier in params['tiers']:
+            tier_location : str = prepare_tier(data_location, tier, params['seed'])
+            results[tier] = run_tier(tier_location, params['repeat'], params['pipeline_args'])
+            print(f"{tier:<8} {results[tier]['transactions']:>10} transactions {results[tier]['wall_seconds']:>8.2f} s "
+                  f"{results[tier]['transactions_per_second']:>12.0f} transactions/s {results[tier]['max_rss_mb']:>8.1f} MB peak RSS")
+
+    with open(params['results_location'], 'w') as f:
+        json.dump({'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'machine': platform.machine(),
+                                   'cpu_count': os.cpu_count(), 'pipeline_args': params['pipeline_args']},
+                   'tiers': results}, f, indent=4)
+    print(f"results written to {params['results_location']}")
+
+    if params['update_baseline']:
+        baseline : dict = {}
+        if os.path.isfile(params['baseline_location']):
+            with open(params['baseline_location']) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(params['baseline_location'], 'w') as f:
+            json.dump(baseline, f, indent=4)
+        print(f"baseline updated in {params['baseline_location']}")
+        return
+
+    if not os.path.isfile(params['baseline_location']):
+        print('no baseline to compare against, store one with --update_baseline')
+        return
+    with open(params['baseline_location']) as f:
+        regressions : list = find_regressions(results, json.load(f), params['threshold'])
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    if regressions:
+        sys.exit(1)
+    print(f"no regression beyond {params['threshold']:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
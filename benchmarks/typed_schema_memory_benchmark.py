@@ -0,0 +1,83 @@
+'''
+Memory footprint of final_df with the default object-string schema and with --compact_types
+cmd to run it (from the repository root): python -m benchmarks.typed_schema_memory_benchmark
+'''
+
+# importing libraries
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from solution import solution_start
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='typed schema memory benchmark')
+    parser.add_argument('--data_location', required=False, default=None,
+                        help='existing generated dataset, a synthetic one is built in memory when not given')
+    parser.add_argument('--customers', required=False, type=int, default=100000)
+    parser.add_argument('--days', required=False, type=int, default=182)
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    return vars(parser.parse_args())
+
+
+def build_frames(number_of_customers : int, days : int, seed : int) -> list:
+    '''
+    Build customers, products and separated transactions shaped like the generated data:
+    every customer buys on roughly one day in seven, 1 to 3 items per basket
+    '''
+    rng = np.random.default_rng(seed)
+    products_df : pd.DataFrame = pd.read_csv('./input_data/starter/products.csv')
+    customer_df : pd.DataFrame = pd.DataFrame({
+        'customer_id': [f"C{number}" for number in range(1, number_of_customers + 1)],
+        'loyalty_score': rng.integers(1, 11, size=number_of_customers)
+    })
+    transactions : int = number_of_customers * days // 7
+    items : np.ndarray = rng.integers(1, 4, size=transactions)
+    rows : int = int(items.sum())
+    minutes : np.ndarray = rng.integers(0, days * 1440, size=transactions)
+    dates : np.ndarray = (np.datetime64('2018-12-01T00:00') + minutes.astype('timedelta64[m]')).astype('datetime64[s]')
+    transaction_df : pd.DataFrame = pd.DataFrame({
+        'customer_id': np.repeat(customer_df['customer_id'].to_numpy(dtype=object)[rng.integers(0, number_of_customers, size=transactions)], items),
+        'date_of_purchase': np.repeat(np.datetime_as_string(dates).astype(object), items),
+        'product_id': products_df['product_id'].to_numpy(dtype=object)[rng.integers(0, len(products_df), size=rows)],
+        'price': rng.integers(1, 2001, size=rows)
+    })
+    transaction_df['date_of_purchase'] = transaction_df['date_of_purchase'].str.replace('T', ' ')
+    return [customer_df, products_df, transaction_df]
+
+
+def read_frames(data_location : str) -> list:
+    params : dict = {
+        'customers_location': os.path.join(data_location, 'customers.csv'),
+        'products_location': os.path.join(data_location, 'products.csv'),
+        'transactions_location': os.path.join(data_location, 'transactions') + '/'
+    }
+    customer_df, product_df = solution_start.read_csv_files(params)
+    transaction_df : pd.DataFrame = solution_start.read_transaction_json_files(sorted(os.listdir(params['transactions_location'])), params)
+    return [customer_df, product_df, transaction_df]
+
+
+def main():
+    params : dict = get_params()
+    if params['data_location']:
+        customer_df, product_df, transaction_df = read_frames(params['data_location'])
+    else:
+        customer_df, product_df, transaction_df = build_frames(params['customers'], params['days'], params['seed'])
+    print(f"{len(customer_df)} customers, {len(transaction_df)} basket items")
+
+    print(f"{'schema':<16} {'encode+merge (s)':>17} {'final_df (MB)':>14}")
+    for name, compact_types in [('object strings', False), ('compact types', True)]:
+        start : float = time.perf_counter()
+        final_df : pd.DataFrame = solution_start.prepare_final_df(product_df, customer_df, transaction_df, {'compact_types': compact_types})
+        seconds : float = time.perf_counter() - start
+        print(f"{name:<16} {seconds:>17.2f} {final_df.memory_usage(deep=True).sum() / 1024 / 1024:>14.1f}")
+        for column, dtype in final_df.dtypes.items():
+            print(f"    {column:<18} {str(dtype):<16} {final_df[column].memory_usage(deep=True) / 1024 / 1024:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
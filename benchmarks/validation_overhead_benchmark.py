@@ -0,0 +1,56 @@
+'''
+Overhead of the data-quality checks (validate_transactions) on a benchmark suite tier: end-to-end
+time with and without --skip_validation and the share of the validate_transactions stage
+cmd to run it (from the repository root): python -m benchmarks.validation_overhead_benchmark --tier large
+'''
+
+# importing libraries
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.ingestion_memory_benchmark import run_pipeline
+from benchmarks.suite import TIERS, prepare_tier
+
+
+def get_params() -> dict:
+    parser = argparse.ArgumentParser(description='validation overhead benchmark')
+    parser.add_argument('--tier', required=False, choices=list(TIERS), default='large')
+    parser.add_argument('--data_location', required=False, default=None, help='directory keeping generated tiers between runs, a temporary one when not given')
+    parser.add_argument('--seed', required=False, type=int, default=42)
+    parser.add_argument('--repeat', required=False, type=int, default=3, help='runs per mode, the fastest one is kept')
+    return vars(parser.parse_args())
+
+
+def run_mode(tier_location : str, temp_dir : str, extra_args : list, repeat : int) -> dict:
+    '''
+    Fastest of repeat pipeline runs, as its run report
+    '''
+    reports : list = []
+    for _ in range(repeat):
+        output_location : str = tempfile.mkdtemp(dir=temp_dir)
+        run_pipeline(tier_location, output_location, extra_args + ['--report_location', os.path.join(output_location, '_run_report.json')])
+        with open(os.path.join(output_location, '_run_report.json')) as f:
+            reports.append(json.load(f))
+    return min(reports, key=lambda report: report['wall_seconds'])
+
+
+def main():
+    params : dict = get_params()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tier_location : str = prepare_tier(params['data_location'] or temp_dir, params['tier'], params['seed'])
+
+        without : dict = run_mode(tier_location, temp_dir, ['--skip_validation'], params['repeat'])
+        validated : dict = run_mode(tier_location, temp_dir, [], params['repeat'])
+
+    stage_seconds : float = sum(stage['wall_seconds'] for stage in validated['stages'] if stage['stage'] == 'validate_transactions')
+    print(f"{'mode':<20} {'time (s)':>10}")
+    print(f"{'skip_validation':<20} {without['wall_seconds']:>10.2f}")
+    print(f"{'validation':<20} {validated['wall_seconds']:>10.2f}")
+    print(f"end-to-end overhead: {(validated['wall_seconds'] - without['wall_seconds']) / without['wall_seconds']:+.1%}")
+    print(f"validate_transactions stage: {stage_seconds:.2f} s, {stage_seconds / validated['wall_seconds']:.1%} of the run")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import json
 import math
 import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
 
 import numpy as np
@@ -98,3 +99,109 @@ def generate_basket(products, product_id_lookup, cats):
             "price": random.randint(1, 2000)
         })
     return basket
+
+
+# Batched generation path: customer behaviour is drawn once up front as numpy arrays and every day partition is
+# then generated from its own seeded generator, so the output only depends on the seed and days can be written in
+# parallel. Transaction lines use the same layout as json.dumps in generate_transactions.
+TIMES_OF_DAY = [f"{minute // 60:02d}:{minute % 60:02d}:00" for minute in range(0, 1440)]
+
+transaction_plan = None
+
+
+def scale_products(products, number_of_products=None):
+    if number_of_products is None:
+        return products
+    base_items = [(category, item) for category in products for item in products[category]]
+    scaled = {category: [] for category in products}
+    for index in range(0, number_of_products):
+        category, item = base_items[index % len(base_items)]
+        copy_number = index // len(base_items)
+        scaled[category].append(item if copy_number == 0 else f"{item} {copy_number + 1}")
+    return {category: items for category, items in scaled.items() if items}
+
+
+def generate_customers_vectorized(output_location_root, number_of_customers, seed):
+    rng = np.random.default_rng([seed, 0])
+    scores = rng.integers(low=1, high=11, size=number_of_customers)
+    with open(f'{output_location_root}/customers.csv', mode='w') as customers_file:
+        csv_writer = csv.writer(customers_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(["customer_id", "loyalty_score"])
+        csv_writer.writerows(zip((f"C{cid}" for cid in range(1, number_of_customers + 1)), scores.tolist()))
+
+
+def plan_transactions(output_location_root, number_of_customers, products, product_id_lookup, products_cats_frequency,
+                      start_datetime, end_datetime, seed):
+    rng = np.random.default_rng([seed, 1])
+    categories = [category for category in products if product_id_lookup.get(category)]
+    num_days = (end_datetime - start_datetime).days
+    customer_frequency_type = np.array([int(num_days / 14), int(num_days / 10), int(num_days / 7),
+                                        int(num_days / 5), int(num_days / 4), int(num_days / 3)])
+    category_weights = np.array([products_cats_frequency.count(category) for category in categories], dtype=float)
+    if category_weights.sum() == 0:
+        category_weights[:] = 1
+    product_ids = [list(product_id_lookup[category].values()) for category in categories]
+    sizes = np.array([len(ids) for ids in product_ids])
+    return {
+        'root': f"{output_location_root}/transactions",
+        'days': [to_canonical_date_str(start_datetime + timedelta(days=d)) for d in range(0, num_days + 1)],
+        'seed': seed,
+        # chance of buying on any given day, the same expected number of days as the per-customer sample above
+        'probability': rng.choice(customer_frequency_type, size=number_of_customers) / (num_days + 1),
+        'num_cats': rng.integers(1, len(categories) + 1, size=number_of_customers),
+        'cats': rng.choice(len(categories), size=(number_of_customers, len(categories)),
+                           p=category_weights / category_weights.sum()),
+        'offsets': np.concatenate([[0], np.cumsum(sizes)[:-1]]),
+        'sizes': sizes,
+        'product_ids': np.array(sum(product_ids, [])),
+    }
+
+
+def set_transaction_plan(plan):
+    global transaction_plan
+    transaction_plan = plan
+
+
+def generate_transaction_lines(plan, day_index):
+    rng = np.random.default_rng([plan['seed'], 2, day_index])
+    day = plan['days'][day_index]
+    buyers = np.flatnonzero(rng.random(len(plan['probability'])) < plan['probability'])
+    cats = plan['cats'][buyers, (rng.random(len(buyers)) * plan['num_cats'][buyers]).astype(int)]
+    basket_sizes = rng.integers(1, 4, size=len(buyers))
+    item_cats = np.repeat(cats, basket_sizes)
+    product_index = plan['offsets'][item_cats] + (rng.random(len(item_cats)) * plan['sizes'][item_cats]).astype(int)
+    prices = rng.integers(1, 2001, size=len(item_cats))
+    minutes = rng.integers(168, 1440, size=len(buyers))
+
+    items = [f'{{"product_id": "{product_id}", "price": {price}}}'
+             for product_id, price in zip(plan['product_ids'][product_index].tolist(), prices.tolist())]
+    ends = np.cumsum(basket_sizes).tolist()
+    starts = [0] + ends[:-1]
+    return [f'{{"customer_id": "C{buyer + 1}", "basket": [{", ".join(items[start:end])}], '
+            f'"date_of_purchase": "{day} {TIMES_OF_DAY[minute]}"}}\n'
+            for buyer, start, end, minute in zip(buyers.tolist(), starts, ends, minutes.tolist())]
+
+
+def write_transaction_day(day_index):
+    day_directory = f"{transaction_plan['root']}/d={transaction_plan['days'][day_index]}"
+    os.makedirs(day_directory, exist_ok=True)
+    lines = generate_transaction_lines(transaction_plan, day_index)
+    with open(f"{day_directory}/transactions.json", mode='w') as transactions_file:
+        transactions_file.writelines(lines)
+    return len(lines)
+
+
+def generate_transactions_vectorized(output_location_root, number_of_customers, products, product_id_lookup,
+                                     products_cats_frequency, start_datetime, end_datetime, seed, workers=1):
+    plan = plan_transactions(output_location_root, number_of_customers, products, product_id_lookup,
+                             products_cats_frequency, start_datetime, end_datetime, seed)
+    day_indexes = range(0, len(plan['days']))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_transaction_plan,
+                                 initargs=(plan,)) as executor:
+            return sum(executor.map(write_transaction_day, day_indexes))
+    set_transaction_plan(plan)
+    try:
+        return sum(write_transaction_day(day_index) for day_index in day_indexes)
+    finally:
+        set_transaction_plan(None)
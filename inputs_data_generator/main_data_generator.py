@@ -1,37 +1,73 @@
+import argparse
 import os
+import random
 import numpy as np
 
 from datetime import datetime
 
-from data_generator import generate_customers, generate_products, generate_transactions
+# run as a script (python inputs_data_generator/main_data_generator.py) or imported from the repository root by the benchmarks
+try:
+    from data_generator import generate_customers, generate_products, generate_transactions, scale_products, \
+        generate_customers_vectorized, generate_transactions_vectorized
+except ImportError:
+    from inputs_data_generator.data_generator import generate_customers, generate_products, generate_transactions, \
+        scale_products, generate_customers_vectorized, generate_transactions_vectorized
 
-if __name__ == "__main__":
-    np.random.seed(seed=42)
-
-    products_data = {
-        "house": ["detergent", "kitchen roll", "bin liners", "shower gel", "scented candles", "fabric softener",
-                  "cling film", "aluminium foil", "toilet paper", "kitchen knife", "dishwasher tablets", "ice pack"],
-        "clothes": ["men's dark green trousers", "women's shoes", "jumper", "men's belt", "women's black socks",
-                    "men's striped socks", "men's trainers", "women's blouse", "women's red dress"],
-        "fruit_veg": ["avocado", "cherries", "scotch bonnets", "peppers", "broccoli", "potatoes", "grapes",
-                      "easy peeler", "mango", "lemon grass", "onions", "apples", "raspberries"],
-        "sweets": ["carrot cake", "salted caramel dark chocolate", "gummy bears", "kombucha", "ice cream", "irn bru"],
-        "food": ["steak", "chicken", "mince beef", "milk", "hummus", "activated charcoal croissant", "whole chicken",
-                 "tuna", "smoked salmon", "camembert", "pizza", "oats", "peanut butter", "almond milk", "lentil soup",
-                 "greek yoghurt", "parmesan", "coconut water", "chicken stock",  "water"],
-        "bws": ["red wine", "gin", "cognac", "cigarettes"]
-    }
-    products_cats_frequency = ["house"]*15 + ["clothes"]*5 + ["fruit_veg"]*25 + ["sweets"] * 20 + ["food"] * 25 + \
-                              ["bws"] * 10
-
-    gen_id = "starter"
-    output_location = f"../input_data/{gen_id}"
+PRODUCTS_DATA = {
+    "house": ["detergent", "kitchen roll", "bin liners", "shower gel", "scented candles", "fabric softener",
+              "cling film", "aluminium foil", "toilet paper", "kitchen knife", "dishwasher tablets", "ice pack"],
+    "clothes": ["men's dark green trousers", "women's shoes", "jumper", "men's belt", "women's black socks",
+                "men's striped socks", "men's trainers", "women's blouse", "women's red dress"],
+    "fruit_veg": ["avocado", "cherries", "scotch bonnets", "peppers", "broccoli", "potatoes", "grapes",
+                  "easy peeler", "mango", "lemon grass", "onions", "apples", "raspberries"],
+    "sweets": ["carrot cake", "salted caramel dark chocolate", "gummy bears", "kombucha", "ice cream", "irn bru"],
+    "food": ["steak", "chicken", "mince beef", "milk", "hummus", "activated charcoal croissant", "whole chicken",
+             "tuna", "smoked salmon", "camembert", "pizza", "oats", "peanut butter", "almond milk", "lentil soup",
+             "greek yoghurt", "parmesan", "coconut water", "chicken stock",  "water"],
+    "bws": ["red wine", "gin", "cognac", "cigarettes"]
+}
+PRODUCTS_CATS_FREQUENCY = ["house"]*15 + ["clothes"]*5 + ["fruit_veg"]*25 + ["sweets"] * 20 + ["food"] * 25 + \
+                          ["bws"] * 10
+
+
+def get_params():
+    parser = argparse.ArgumentParser(description='Generate customers, products and daily transactions')
+    parser.add_argument('--output_location', required=False, default="../input_data/starter")
+    parser.add_argument('--customers', type=int, required=False, default=137)
+    parser.add_argument('--products', type=int, required=False, default=None,
+                        help='Number of products, repeating the built-in catalogue as needed')
+    parser.add_argument('--start_date', type=lambda d: datetime.strptime(d, '%Y-%m-%d'), required=False,
+                        default=datetime(2018, 12, 1))
+    parser.add_argument('--end_date', type=lambda d: datetime.strptime(d, '%Y-%m-%d'), required=False,
+                        default=datetime(2019, 3, 1))
+    parser.add_argument('--seed', type=int, required=False, default=42)
+    parser.add_argument('--method', choices=['loop', 'vectorized'], required=False, default='loop',
+                        help='loop writes one customer at a time, vectorized generates whole days in batches')
+    parser.add_argument('--workers', type=int, required=False, default=1,
+                        help='Processes generating day partitions in parallel with --method vectorized')
+    return vars(parser.parse_args())
+
+
+def generate_dataset(output_location, number_of_customers, start_date, end_date, number_of_products=None, seed=42,
+                     method='loop', workers=1):
     os.makedirs(output_location, exist_ok=True)
+    products_data = scale_products(PRODUCTS_DATA, number_of_products)
+    end_date = end_date.replace(hour=23, minute=59, second=59)
+    if method == 'vectorized':
+        generate_customers_vectorized(output_location, number_of_customers, seed)
+        product_id_lookup = generate_products(output_location, products_data)
+        generate_transactions_vectorized(output_location, number_of_customers, products_data, product_id_lookup,
+                                         PRODUCTS_CATS_FREQUENCY, start_date, end_date, seed, workers)
+    else:
+        np.random.seed(seed=seed)
+        random.seed(seed)
+        gen_customers = generate_customers(output_location, number_of_customers)
+        product_id_lookup = generate_products(output_location, products_data)
+        generate_transactions(output_location, gen_customers, products_data, product_id_lookup,
+                              PRODUCTS_CATS_FREQUENCY, start_date, end_date)
 
-    gen_customers = generate_customers(output_location, 137)
-    product_id_lookup = generate_products(output_location, products_data)
 
-    start_date = datetime(2018, 12, 1, 0, 0, 0)
-    end_date = datetime(2019, 3, 1, 23, 59, 59)
-    generate_transactions(output_location, gen_customers, products_data, product_id_lookup, products_cats_frequency,
-                          start_date, end_date)
+if __name__ == "__main__":
+    params = get_params()
+    generate_dataset(params['output_location'], params['customers'], params['start_date'], params['end_date'],
+                     params['products'], params['seed'], params['method'], params['workers'])
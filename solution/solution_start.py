@@ -2,13 +2,48 @@
 import argparse
 from typing import final
 from numpy import ndarray
+import numpy as np
 import pandas as pd
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import logging
-from typing import Callable
+import hashlib
+import gzip
+import time
+import resource
+import cProfile
+import tracemalloc
+import mmap
+import sys
+import functools
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator
+
+# optional faster JSON encoder, the standard library json module is used without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# optional vectorized string kernels for parsing customer ids, pandas string methods are used without it
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+# rows (transactions) parsed together when no --chunk_size/--max_memory is given
+DEFAULT_CHUNK_SIZE : int = 100000
+
+# rough peak bytes needed per transaction while parsing, exploding and merging a chunk
+BYTES_PER_TRANSACTION : int = 4096
+
+# bytes of a memory-mapped transactions.json split into lines at a time
+MMAP_BATCH_BYTES : int = 8 * 1024 * 1024
 
 def get_params() -> dict:
     parser = argparse.ArgumentParser(description='DataTest')
@@ -16,7 +51,40 @@ def get_params() -> dict:
     parser.add_argument('--products_location', required=False, default="./input_data/starter/products.csv")
     parser.add_argument('--transactions_location', required=False, default="./input_data/starter/transactions/")
     parser.add_argument('--output_location', required=False, default="./output_data/outputs/")
-    return vars(parser.parse_args())
+    parser.add_argument('--start_date', required=False, default=None, help='first d=YYYY-MM-DD partition to read (YYYY-MM-DD)')
+    parser.add_argument('--end_date', required=False, default=None, help='last d=YYYY-MM-DD partition to read (YYYY-MM-DD)')
+    parser.add_argument('--weeks', required=False, type=int, default=None, help='only read the partitions of the last N weeks (Monday to Sunday) up to --end_date or the latest partition')
+    parser.add_argument('--chunk_size', required=False, type=int, default=None, help='transactions parsed per chunk, enables streaming mode')
+    parser.add_argument('--max_memory', required=False, type=int, default=None, help='approximate memory budget in MB for a chunk, enables streaming mode')
+    parser.add_argument('--workers', required=False, type=int, default=1, help='processes parsing day partitions in parallel')
+    parser.add_argument('--prefetch', required=False, type=int, default=None, help='transactions.json files read ahead by a thread pool while earlier ones are parsed, for storage with slow opens')
+    parser.add_argument('--mmap', required=False, action='store_true', help='memory-map transactions.json files and parse lines from the mapped bytes, no lower peak RSS than the default line iteration')
+    parser.add_argument('--engine', required=False, default='pandas', choices=list(ENGINES), help='execution backend of the pipeline')
+    parser.add_argument('--spark_master', required=False, default='local[*]', help='Spark master URL for --engine spark')
+    parser.add_argument('--output_format', required=False, default='json', choices=['json', 'jsonl', 'parquet'], help='weekly output: dict-of-customers JSON, JSON Lines (one customer per line) or Parquet (one customer per row)')
+    parser.add_argument('--compact_json', required=False, action='store_true', help='write weekly JSON without indentation')
+    parser.add_argument('--json_encoder', required=False, default='json', choices=['json', 'orjson', 'auto'], help='JSON encoder backend for compact output, orjson/auto fall back to json when it is not installed')
+    parser.add_argument('--gzip_output', required=False, action='store_true', help='gzip the weekly JSON/JSON Lines files, gzip compression for Parquet')
+    parser.add_argument('--compact_types', required=False, action='store_true', help='keep ids and categories dictionary-encoded until JSON serialization')
+    parser.add_argument('--cache_location', required=False, default=None, help='directory of the columnar (Parquet) cache of parsed partitions')
+    parser.add_argument('--incremental', required=False, action='store_true', help='only regenerate weeks whose partitions changed since the last run')
+    parser.add_argument('--report_location', required=False, default=None, help='JSON run report with per stage metrics, defaults to <output_location>/_run_report.json')
+    parser.add_argument('--profile', required=False, action='store_true', help='run under cProfile and tracemalloc, writing <output_location>/_profile.pstats')
+    parser.add_argument('--manifest_location', required=False, default=None, help='manifest of processed partitions, defaults to <output_location>/_manifest.json')
+    parser.add_argument('--skip_validation', required=False, action='store_true', help='do not check the transactions for schema and referential problems')
+    parser.add_argument('--quarantine_location', required=False, default=None, help='JSON file of the rejected transactions with their reasons, defaults to <output_location>/_quarantine.json')
+    parser.add_argument('--aggregate_location', required=False, default=None, help='directory of the per customer, per week aggregate store, updated with every week written')
+    subparsers = parser.add_subparsers(dest='command')
+    rolling_parser = subparsers.add_parser('rolling', help='query rolling per customer aggregates from --aggregate_location instead of running the pipeline')
+    rolling_parser.add_argument('--window', required=False, type=int, default=4, help='number of weeks, e.g. 4, 13 or 52')
+    rolling_parser.add_argument('--end_week', required=False, default=None, help='last week ending date of the window (YYYY-MM-DD), defaults to the latest stored week')
+    rolling_parser.add_argument('--level', required=False, default='category', choices=list(AGGREGATE_LEVELS), help='aggregate per customer, per customer and category or per customer and product')
+    rolling_parser.add_argument('--customer_ids', required=False, nargs='+', default=None, help='only these customers')
+    rolling_parser.add_argument('--query_output', required=False, default=None, help='CSV file for the result, printed when not given')
+    params : dict = vars(parser.parse_args())
+    if params['command'] == 'rolling' and not params['aggregate_location']:
+        parser.error('rolling needs --aggregate_location')
+    return params
 
 
 
@@ -42,6 +110,182 @@ def configure_logging():
     logging.info('logging configured - Start')
     
 
+class RunReport(object):
+    '''
+    Metrics of the pipeline stages of one run: wall time, CPU time, rows in/out
+    and memory, written as a machine-readable JSON report.
+    '''
+
+    def __init__(self, params : dict):
+        self.params : dict = {key: value for key, value in params.items() if isinstance(value, (str, int, float, bool, type(None)))}
+        self.started : str = datetime.now().isoformat()
+        self.start_time : float = time.perf_counter()
+        self.start_cpu : float = time.process_time()
+        self.stages : list = []
+        # highest peak RSS seen by the stages, the process peak is reset while measuring them
+        self.max_rss_mb : float = 0.0
+
+    def record(self, metrics : dict):
+        self.stages.append(metrics)
+
+    def write(self, path : str):
+        '''
+        Write the run report to path
+
+                Parameters:
+                        path (str): report file path
+
+                Returns:
+                        Nothing
+        '''
+
+        report : dict = {
+            'started': self.started,
+            'wall_seconds': round(time.perf_counter() - self.start_time, 6),
+            'cpu_seconds': round(time.process_time() - self.start_cpu, 6),
+            'max_rss_mb': max(self.max_rss_mb, peak_rss_mb()),
+            'params': self.params,
+            'stages': self.stages
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+
+
+# report of the current run, stages are only measured while it is set
+run_report : RunReport = None
+
+# traced memory peaks of the stages currently running, outermost first (with --profile)
+stage_peaks : list = []
+
+# peak RSS (MB) of the stages currently running, outermost first
+rss_peaks : list = []
+
+
+def count_rows(value) -> int:
+    '''
+    Number of rows of a dataframe, or of the dataframes in a list
+    '''
+
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, (list, tuple)) and any(isinstance(item, pd.DataFrame) for item in value):
+        return sum(len(item) for item in value if isinstance(item, pd.DataFrame))
+    return None
+
+
+def current_rss_mb() -> float:
+    '''
+    Resident memory of the process in MB (Linux), None where /proc is not available
+    '''
+
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> float:
+    '''
+    Peak resident memory in MB since the last reset_peak_rss() (Linux), the
+    peak of the whole process where /proc is not available
+    '''
+
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def reset_peak_rss():
+    '''
+    Reset the peak resident memory of the process to its current RSS (Linux), nothing where it is not supported
+    '''
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def instrument(stage : str, label_arg : int = None, rows_arg : int = None) -> Callable:
+    '''
+    Decorator recording the metrics of a pipeline stage into run_report
+
+            Parameters:
+                    stage (str): name of the stage in the report
+                    label_arg (int): position of an argument (e.g. week name) stored as label
+                    rows_arg (int): position of the fact-table (transactions) dataframe argument counted as rows_in
+
+            Returns:
+                    decorator (Callable)
+    '''
+
+    def decorator(function : Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if run_report is None:
+                return function(*args, **kwargs)
+
+            tracing : bool = tracemalloc.is_tracing()
+            if tracing:
+                # keeping the enclosing stage's peak before measuring this one from scratch
+                if stage_peaks:
+                    stage_peaks[-1] = max(stage_peaks[-1], tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+                stage_peaks.append(0)
+            # same for the peak RSS, which is also kept as the peak of the run
+            rss_peak : float = peak_rss_mb()
+            run_report.max_rss_mb = max(run_report.max_rss_mb, rss_peak)
+            if rss_peaks:
+                rss_peaks[-1] = max(rss_peaks[-1], rss_peak)
+            reset_peak_rss()
+            rss_peaks.append(0.0)
+            start_time : float = time.perf_counter()
+            start_cpu : float = time.process_time()
+
+            try:
+                result = function(*args, **kwargs)
+            except BaseException:
+                if tracing:
+                    stage_peaks.pop()
+                rss_peaks.pop()
+                raise
+
+            rss_peak = max(rss_peaks.pop(), peak_rss_mb())
+            run_report.max_rss_mb = max(run_report.max_rss_mb, rss_peak)
+            if rss_peaks:
+                rss_peaks[-1] = max(rss_peaks[-1], rss_peak)
+
+            metrics : dict = {
+                'stage': stage,
+                'wall_seconds': round(time.perf_counter() - start_time, 6),
+                'cpu_seconds': round(time.process_time() - start_cpu, 6),
+                'rows_in': count_rows(args[rows_arg]) if rows_arg is not None and len(args) > rows_arg else None,
+                'rows_out': count_rows(result),
+                'rss_mb': current_rss_mb(),
+                'peak_rss_mb': rss_peak
+            }
+            if label_arg is not None and len(args) > label_arg:
+                metrics['label'] = str(args[label_arg]).split(' ')[0]
+            if tracing:
+                peak : int = max(stage_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                metrics['peak_traced_mb'] = round(peak / 1024 / 1024, 3)
+                if stage_peaks:
+                    stage_peaks[-1] = max(stage_peaks[-1], peak)
+            run_report.record(metrics)
+            return result
+        return wrapper
+    return decorator
+
+
+@instrument('read_csv_files')
 def read_csv_files(params : dict) -> list:
     '''
     Read the customers and products csv files in dataframe
@@ -61,7 +305,9 @@ def read_csv_files(params : dict) -> list:
     try:
         customer_df : pd.DataFrame = pd.read_csv(str(params["customers_location"]))
     except IOError as error:
+        # no week can be built without the customers, logging and stopping the run
         logging.error(error)
+        raise
 
     # dataframe for product csv file
     logging.info('Reading the products.csv file into pandas->dataframe')
@@ -69,6 +315,7 @@ def read_csv_files(params : dict) -> list:
         product_df : pd.DataFrame = pd.read_csv(str(params["products_location"]))
     except IOError as error:
         logging.error(error)
+        raise
 
     return [customer_df, product_df]
 
@@ -88,256 +335,1887 @@ def separate_column_elements(transaction_raw_df : pd.DataFrame) -> pd.DataFrame:
     logging.info('Inside separate_column_elements() function for basket column values division and separation')
 
     # convert each row of basket column to JSON object --> for testing by giving external csv file instead of dataframe created
-    if type(transaction_raw_df['basket'][0]) == str:
-        transaction_raw_df['basket'] = transaction_raw_df['basket'].apply(json.loads)
+    baskets : list = []
+    malformed : list = []
+    for position, basket in enumerate(transaction_raw_df['basket']):
+        if isinstance(basket, str):
+            try:
+                basket = json.loads(basket)
+            except ValueError:
+                malformed.append(position)
+        baskets.append(basket)
+
+    # transactions whose basket is not valid JSON are quarantined instead of being separated
+    if malformed:
+        records : pd.DataFrame = transaction_raw_df.iloc[malformed].astype(object)
+        quarantine_records('malformed_basket', records.where(records.notna(), None).to_dict('records'))
+        kept : ndarray = np.ones(len(baskets), dtype=bool)
+        kept[malformed] = False
+        transaction_raw_df = transaction_raw_df[kept]
+        baskets = [basket for basket, keep in zip(baskets, kept.tolist()) if keep]
+
+    # number of rows every transaction explodes into (an empty basket still keeps its transaction row)
+    lengths : ndarray = np.fromiter((len(basket) if isinstance(basket, list) and basket else 1 for basket in baskets), dtype=np.int64, count=len(baskets))
+
+    # flat list of basket items, None standing in for an empty basket
+    items : list = [item for basket in baskets for item in (basket if isinstance(basket, list) and basket else [None])]
+
+    # repeating the other columns once per basket item and dropping the basket column
+    transaction_df : pd.DataFrame = transaction_raw_df.drop(['basket'], axis=1).take(np.repeat(np.arange(len(baskets)), lengths)).reset_index(drop=True)
+
+    # building product_id and price columns straight from the basket dictionaries
+    items = [item if isinstance(item, dict) else {} for item in items]
+    transaction_df['product_id'] = pd.Series([item.get('product_id', np.nan) for item in items], index=transaction_df.index)
+    transaction_df['price'] = pd.Series([item.get('price', np.nan) for item in items], index=transaction_df.index)
 
-    # exploding basket column's data into individual row as it contain list of dictionary
-    intermediate_df : pd.DataFrame = transaction_raw_df.explode('basket').reset_index(drop=True)
-    
-    # applying pd.Series to each row of "basket" column as it contains dictionary, to achieve further atomicity
-    temp_df : pd.DataFrame = intermediate_df['basket'].apply(pd.Series)
+    logging.info('created the separate columns for values inside basket column, and deleted basket column')
 
-    # now adding separate columns for each element of temp_df to intermediate_df(main df)
-    intermediate_df[["product_id", "price"]] = temp_df
+    return transaction_df
 
-    # dropping the useless basket column (as we now having it's data separately)
-    transaction_df : pd.DataFrame = intermediate_df.drop(['basket'], axis=1)
+def get_chunk_size(params : dict) -> int:
+    '''
+    Number of transactions to parse together, from --chunk_size or derived from --max_memory
 
-    logging.info('created the separate columns for values inside basket column, and deleted basket column')
+            Parameters:
+                    params (dict): dictionary containing the input and output parameters
 
-    return transaction_df
+            Returns:
+                    chunk_size (int): transactions per chunk
+    '''
 
-def read_transaction_json_files(transaction_dirs : list, params : dict) -> pd.DataFrame:
+    if params.get('chunk_size'):
+        return int(params['chunk_size'])
+    if params.get('max_memory'):
+        return max(1, int(params['max_memory']) * 1024 * 1024 // BYTES_PER_TRANSACTION)
+    return DEFAULT_CHUNK_SIZE
+
+
+def parse_transaction_lines(lines : list) -> pd.DataFrame:
     '''
-    Read the transactions json files in dataframe
-    and return the dataframes.
+    Parse a batch of JSON lines and separate their baskets
+
+            Parameters:
+                    lines (list): JSON lines of transactions
+
+            Returns:
+                    transaction_df (Pandas: DataFrame): transactions dataframe for the batch
+    '''
+
+    # each line is one transaction with customer_id, basket and date_of_purchase
+    try:
+        transactions : list = [json.loads(line) for line in lines]
+    except ValueError:
+        transactions = None
+    # lines which are not JSON objects are quarantined one by one, only for the batches having some
+    if transactions is None or not all(isinstance(transaction, dict) for transaction in transactions):
+        transactions = load_transaction_lines(lines)
+    transaction_raw_df : pd.DataFrame = pd.DataFrame(transactions, columns=['customer_id', 'basket', 'date_of_purchase'])
+
+    # exploding and separating elements in "basket" column to achieve atomicity
+    return separate_column_elements(transaction_raw_df)
+
+
+def load_transaction_lines(lines : list) -> list:
+    '''
+    Parse JSON lines one at a time, quarantining the ones which are not JSON objects
+
+            Parameters:
+                    lines (list): JSON lines of transactions (str or bytes)
+
+            Returns:
+                    transactions (list): dictionaries of the valid lines
+    '''
+
+    transactions : list = []
+    rejected : dict = {'malformed_json': [], 'not_an_object': []}
+    for line in lines:
+        text : str = line.decode('utf-8', 'replace') if isinstance(line, bytes) else line
+        try:
+            transaction = json.loads(line)
+        except ValueError:
+            rejected['malformed_json'].append({'line': text.rstrip('\r\n')})
+            continue
+        if isinstance(transaction, dict):
+            transactions.append(transaction)
+        else:
+            rejected['not_an_object'].append({'line': text.rstrip('\r\n')})
+
+    for reason, records in rejected.items():
+        quarantine_records(reason, records)
+    return transactions
+
+
+def iter_transaction_chunks(transaction_dirs : list, params : dict) -> Iterator[pd.DataFrame]:
+    '''
+    Read the transactions json files incrementally and yield
+    one separated transactions dataframe per chunk of lines.
 
             Parameters:
                     transaction_dirs (list): list of directories containing transactions.json file
                     params (dict): dictionary containing the input and output parameters
 
             Returns:
-                    transaction_df (Pandas: DataFrame): transactions dataframe
+                    transaction_df (Iterator: DataFrame): transactions dataframe for each chunk
     '''
 
-    logging.info('Inside read_transaction_json_files() function')
-
-    # list to store all the JSON lines
-    transaction_list : list = []
+    logging.info('Inside iter_transaction_chunks() function')
+
+    # one chunk per day partition, read from the columnar cache when it is up to date
+    if params.get('cache_location'):
+        yield from iter_cached_partitions(transaction_dirs, params)
+        return
+
+    # one chunk per day partition, parsed by a pool of worker processes
+    if int(params.get('workers') or 1) > 1:
+        yield from iter_transaction_partitions_parallel(transaction_dirs, params)
+        return
+
+    # one chunk per day partition, read ahead by a pool of threads
+    if params.get('prefetch'):
+        yield from iter_prefetched_partitions(transaction_dirs, params)
+        return
+
+    chunk_size : int = get_chunk_size(params)
+    lines : list = []
+
+    # memory-mapped files, split into lines one batch of bytes at a time
+    if params.get('mmap'):
+        for transaction in transaction_dirs:
+            logging.info('Mapping transactions.json file inside '+ str(transaction) + ' folder')
+            for batch in iter_mapped_lines(str(params['transactions_location'])+ str(transaction) +"/transactions.json"):
+                lines.extend(batch)
+                while len(lines) >= chunk_size:
+                    yield parse_transaction_lines(lines[:chunk_size])
+                    del lines[:chunk_size]
+        if lines:
+            yield parse_transaction_lines(lines)
+        return
 
-    logging.info('Iterating over the list of transaction directories')
     # iterating over folders for transactions.json file
     for transaction in transaction_dirs:
 
         logging.info('Reading transactions.json file inside '+ str(transaction) + ' folder')
-        # opening json file
         with open(str(params['transactions_location'])+ str(transaction) +"/transactions.json") as f:
-            # spliting and storing each line of file into list
-            lines : list = f.read().splitlines()
+            # reading line by line so only the current chunk is held in memory
+            for line in f:
+                if not line.strip():
+                    continue
+                lines.append(line)
+                if len(lines) == chunk_size:
+                    yield parse_transaction_lines(lines)
+                    lines = []
 
-            # storing for each files data into common list
-            transaction_list.extend(lines)
+    if lines:
+        yield parse_transaction_lines(lines)
 
-    logging.info('Converting Lists of JSON files into Pandas->DataFrame')
-    # converting list into DataFrame
-    intermediate_df : pd.DataFrame = pd.DataFrame(transaction_list)
 
-    # giving temperory column name as json_element
-    intermediate_df.columns = ['json_element']
+def iter_mapped_lines(path : str, batch_bytes : int = MMAP_BATCH_BYTES) -> Iterator[list]:
+    '''
+    Memory-map a JSON lines file and yield its non-blank lines (bytes) in batches,
+    so only the pages of the current batch need to be resident. Each batch is
+    copied out of the mapping before it is split, so this is not zero-copy and
+    peaks about as high as iterating over the file's lines.
 
-    # applying json.loads function on each row, as each row is a json file and normalizing it to dataframe
-    transaction_raw_df : pd.DataFrame = pd.json_normalize(intermediate_df['json_element'].apply(json.loads))
+            Parameters:
+                    path (str): transactions.json file
+                    batch_bytes (int): approximate bytes of the file split per batch
 
-    # exploding and separating elements in "basket" column to achieve atomicity
-    transaction_df : pd.DataFrame = separate_column_elements(transaction_raw_df)
+            Returns:
+                    lines (Iterator: list): lines of each batch, without line endings
+    '''
 
-    return transaction_df
+    with open(path, 'rb') as f:
+        # empty files cannot be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            size : int = len(buffer)
+            start : int = 0
+            if hasattr(buffer, 'madvise'):
+                buffer.madvise(mmap.MADV_SEQUENTIAL)
+            while start < size:
+                # every batch ends on a line boundary, the last one at the end of the file
+                end : int = buffer.find(b'\n', min(start + batch_bytes, size) - 1)
+                end = size if end == -1 else end + 1
+                yield [line for line in buffer[start:end].split(b'\n') if line.strip()]
+                # pages of finished batches are dropped from the resident set, they are only re-read from the file
+                released : int = start - start % mmap.PAGESIZE
+                if hasattr(buffer, 'madvise') and end - released >= mmap.PAGESIZE:
+                    buffer.madvise(mmap.MADV_DONTNEED, released, (end - released) // mmap.PAGESIZE * mmap.PAGESIZE)
+                start = end
+
+
+def read_transaction_partition(transaction : str, params : dict) -> pd.DataFrame:
+    '''
+    Read and separate the transactions.json file of one day partition,
+    used by the worker processes of iter_transaction_partitions_parallel().
 
-def sorted_alphanumeric_Ids(customers : list) -> list:
+            Parameters:
+                    transaction (str): directory containing transactions.json file
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    transaction_df (Pandas: DataFrame): transactions dataframe of the partition, None if it is empty
     '''
-    Sort the AlphaNumeric Customer Ids(String)
+
+    chunks : list = list(iter_transaction_chunks([transaction], dict(params, workers=1, cache_location=None)))
+    return pd.concat(chunks, ignore_index=True) if chunks else None
+
+
+def read_transaction_partition_worker(transaction : str, params : dict) -> tuple:
+    '''
+    read_transaction_partition() in a worker process, also returning the records
+    it quarantined since the worker does not share the quarantine of the main process
 
             Parameters:
-                    customers (list): list of customer_ids
+                    transaction (str): directory containing transactions.json file
+                    params (dict): dictionary containing the input and output parameters
 
             Returns:
-                    sorted customers (list): list of sorted customer_ids
+                    transaction_df (Pandas: DataFrame), rejected (Quarantine): partition dataframe and its quarantined records
     '''
-    # anonymous function to convert numbers(string) to int after split
-    convert : Callable[[str], object] = lambda text: int(text) if text.isdigit() else text
-    # anonymous function to split numbers from each id
-    alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
-    return sorted(customers, key = alphanum_key)
 
+    global quarantine
+    quarantine = Quarantine()
+    return read_transaction_partition(transaction, params), quarantine
 
-def generate_json(df : pd.DataFrame, name : str, params : dict):
 
+def iter_transaction_partitions_parallel(transaction_dirs : list, params : dict) -> Iterator[pd.DataFrame]:
     '''
-    Create JSON files using weekly data
+    Parse the day partitions in a process pool and yield their
+    dataframes in the order of transaction_dirs, whatever order the workers finish in.
 
             Parameters:
-                    df (Pandas: DataFrame): final weekly dataframe
+                    transaction_dirs (list): list of directories containing transactions.json file
                     params (dict): dictionary containing the input and output parameters
 
             Returns:
-                    Nothing
+                    transaction_df (Iterator: DataFrame): transactions dataframe for each partition
     '''
 
-    logging.info('Inside generate_json() Function')
+    workers : int = int(params['workers'])
+    logging.info('Parsing transaction partitions with ' + str(workers) + ' worker processes')
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # bounded window of partitions in flight so finished results do not pile up in memory
+        futures : deque = deque()
+        for transaction in transaction_dirs:
+            futures.append(executor.submit(read_transaction_partition_worker, transaction, params))
+            if len(futures) >= 2 * workers:
+                transaction_df, rejected = futures.popleft().result()
+                if quarantine is not None:
+                    quarantine.extend(rejected)
+                if transaction_df is not None:
+                    yield transaction_df
+
+        while futures:
+            transaction_df, rejected = futures.popleft().result()
+            if quarantine is not None:
+                quarantine.extend(rejected)
+            if transaction_df is not None:
+                yield transaction_df
+
+
+def read_file_bytes(path : str, opener : Callable = open) -> bytes:
+    '''
+    Read a whole file, opened with opener (a stand-in for open() in tests and benchmarks)
+    '''
+    with opener(path, 'rb') as f:
+        return f.read()
 
-    # list of unique customers
-    customers : list = list(df['customer_id'].unique())
 
-    #sort customers
-    customers = sorted_alphanumeric_Ids(customers)
-    
-    output_dict : dict = {}
-
-    for customer in customers:
-        output_dict[customer] = {}
-        
-        #initializing purchase_count with 0
-        output_dict[customer]['purchase_count'] = 0
-
-        # iteration over rows where customer Ids match
-        for idx, row in df[df['customer_id'] == customer].iterrows():
-
-            #storing data to dictionary as required
-            output_dict[customer]['loyalty_score'] = row['loyalty_score']
-            if 'product_id' in output_dict[customer]:
-                output_dict[customer]['product_id'].append(row['product_id'])
-                output_dict[customer]['purchase_count'] += 1
-            else:
-                output_dict[customer]['product_id'] = []
-            if 'product_category' in output_dict[customer]:
-                output_dict[customer]['product_category'].append(row['product_category'])
-            else:
-                output_dict[customer]['product_category'] = []
-    
+def iter_prefetched_partitions(transaction_dirs : list, params : dict, opener : Callable = open) -> Iterator[pd.DataFrame]:
+    '''
+    Read the transactions.json files of the day partitions in a thread pool, keeping
+    --prefetch files in flight, and parse them in order on the calling thread so
+    opening and reading overlap with parsing.
 
-    # checking if the given directory already present in the system (if not creating it)
-    if os.path.exists(params['output_location']) == False:
-        try:
-            os.makedirs(params['output_location'], exist_ok=True)
-        except OSError as error:
-            logging.error(error)
+            Parameters:
+                    transaction_dirs (list): list of directories containing transactions.json file
+                    params (dict): dictionary containing the input and output parameters
+                    opener (Callable): function opening a file like open()
 
-    logging.info('Storing Week_' +str(name).split(' ')[0]+'.json file')    
+            Returns:
+                    transaction_df (Iterator: DataFrame): transactions dataframe for each partition
+    '''
 
-    try:
-        # dumping dictionary to JSON file with naming convension --> Week_<<sunday_date>>.json
-        with open(str(params['output_location']) + 'Week_'+str(name).split(' ')[0]+'.json', 'w', encoding='utf-8') as f:
-            json.dump(output_dict, f, ensure_ascii=False, indent=4)
-    except IOError as error:
-        logging.error(error)
-    
+    prefetch : int = max(1, int(params.get('prefetch') or 1))
+    logging.info('Reading transaction partitions with ' + str(prefetch) + ' files in flight')
 
-def segregate_weekly(final_df : pd.DataFrame, params : dict):
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        # bounded queue of files in flight, at most prefetch files are held in memory unparsed
+        futures : deque = deque()
+        for transaction in transaction_dirs:
+            if len(futures) >= prefetch:
+                lines : list = [line for line in futures.popleft().result().split(b'\n') if line.strip()]
+                if lines:
+                    yield parse_transaction_lines(lines)
+            futures.append(executor.submit(read_file_bytes, str(params['transactions_location']) + str(transaction) + '/transactions.json', opener))
+
+        while futures:
+            lines : list = [line for line in futures.popleft().result().split(b'\n') if line.strip()]
+            if lines:
+                yield parse_transaction_lines(lines)
 
+
+def type_transactions(transaction_df : pd.DataFrame) -> pd.DataFrame:
     '''
-    Segregate the DataFrame Week-wise.
+    Convert a separated transactions dataframe to the typed schema kept in the cache
 
             Parameters:
-                    final_df (Pandas: DataFrame): Final DataFrame with whole data
+                    transaction_df (Pandas: DataFrame): transactions dataframe, None for an empty partition
+
+            Returns:
+                    transaction_df (Pandas: DataFrame): transactions with date_of_purchase as datetime64 and numeric price
+    '''
+
+    if transaction_df is None:
+        transaction_df = pd.DataFrame({'customer_id': pd.Series(dtype=object), 'date_of_purchase': pd.Series(dtype=object),
+                                       'product_id': pd.Series(dtype=object), 'price': pd.Series(dtype='int64')})
+
+    transaction_df = transaction_df[['customer_id', 'date_of_purchase', 'product_id', 'price']].copy()
+    # invalid values become NaT/NaN and are quarantined by validate_transactions() when the partition is read
+    transaction_df['date_of_purchase'] = parse_purchase_timestamps(transaction_df['date_of_purchase'])
+    transaction_df['price'] = pd.to_numeric(transaction_df['price'], errors='coerce')
+    return transaction_df
+
+
+def read_cached_partition(transaction : str, params : dict, columns : list = None, start_date : datetime = None, end_date : datetime = None) -> pd.DataFrame:
+    '''
+    Read one day partition from the Parquet cache, re-parsing its transactions.json
+    file first when the cache is missing or its size/mtime changed.
+
+            Parameters:
+                    transaction (str): directory containing transactions.json file
+                    params (dict): dictionary containing the input and output parameters (cache_location)
+                    columns (list): columns to read, all when None
+                    start_date (datetime): only rows with date_of_purchase on or after it
+                    end_date (datetime): only rows with date_of_purchase before it
+
+            Returns:
+                    transaction_df (Pandas: DataFrame): typed transactions dataframe of the partition
+    '''
+
+    source_path : str = str(params['transactions_location']) + str(transaction) + '/transactions.json'
+    cache_dir : str = os.path.join(str(params['cache_location']), str(transaction))
+    cache_path : str = os.path.join(cache_dir, 'transactions.parquet')
+    source_meta_path : str = os.path.join(cache_dir, '_source.json')
+
+    stat : os.stat_result = os.stat(source_path)
+    source : dict = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    cached_source : dict = None
+    if os.path.exists(cache_path) and os.path.exists(source_meta_path):
+        with open(source_meta_path, encoding='utf-8') as f:
+            cached_source = json.load(f)
+
+    if cached_source != source:
+        logging.info('Caching ' + str(transaction) + ' partition to ' + cache_path)
+        transaction_df : pd.DataFrame = type_transactions(read_transaction_partition(transaction, params))
+        os.makedirs(cache_dir, exist_ok=True)
+        transaction_df.to_parquet(cache_path + '.tmp', index=False)
+        os.replace(cache_path + '.tmp', cache_path)
+        with open(source_meta_path, 'w', encoding='utf-8') as f:
+            json.dump(source, f)
+
+    # pushing the date predicate down to the Parquet reader
+    filters : list = []
+    if start_date is not None:
+        filters.append(('date_of_purchase', '>=', pd.Timestamp(start_date)))
+    if end_date is not None:
+        filters.append(('date_of_purchase', '<', pd.Timestamp(end_date)))
+
+    return pd.read_parquet(cache_path, columns=columns, filters=filters or None)
+
+
+def iter_cached_partitions(transaction_dirs : list, params : dict, columns : list = None, start_date : datetime = None, end_date : datetime = None) -> Iterator[pd.DataFrame]:
+    '''
+    Yield the typed transactions of each day partition from the Parquet cache,
+    skipping partitions outside [start_date, end_date) without opening them.
+
+            Parameters:
+                    transaction_dirs (list): list of directories containing transactions.json file
+                    params (dict): dictionary containing the input and output parameters (cache_location)
+                    columns (list): columns to read, all when None
+                    start_date (datetime): only rows with date_of_purchase on or after it
+                    end_date (datetime): only rows with date_of_purchase before it
+
+            Returns:
+                    transaction_df (Iterator: DataFrame): typed transactions dataframe for each partition
+    '''
+
+    logging.info('Reading transaction partitions through the cache in ' + str(params['cache_location']))
+
+    for transaction in transaction_dirs:
+        date : datetime = partition_date(transaction)
+        if date is not None and ((start_date is not None and date < pd.Timestamp(start_date).normalize()) or (end_date is not None and date >= pd.Timestamp(end_date))):
+            continue
+        yield read_cached_partition(transaction, params, columns, start_date, end_date)
+
+
+@instrument('read_transaction_json_files')
+def read_transaction_json_files(transaction_dirs : list, params : dict) -> pd.DataFrame:
+    '''
+    Read the transactions json files in dataframe
+    and return the dataframes.
+
+            Parameters:
+                    transaction_dirs (list): list of directories containing transactions.json file
                     params (dict): dictionary containing the input and output parameters
 
             Returns:
-                    Nothing
+                    transaction_df (Pandas: DataFrame): transactions dataframe
     '''
 
-    logging.info('Inside segregate_weekly() function')
+    logging.info('Inside read_transaction_json_files() function')
 
-    # converting the dataframe object to DateTime type Format
-    final_df['date_of_purchase'] = [datetime.strptime(dates.split(" ")[0], '%Y-%m-%d') for dates in final_df['date_of_purchase']]
+    logging.info('Iterating over the list of transaction directories')
+    # parsing chunk by chunk (or partition by partition with --workers) keeps only one chunk of raw lines in memory at a time
+    chunks : list = list(iter_transaction_chunks(transaction_dirs, params))
 
-    logging.info('Sorting final dataframe date-wise')
-    # sorting the dataframe date-wise
-    final_df = final_df.sort_values(by='date_of_purchase')
+    if not chunks:
+        return pd.DataFrame(columns=['customer_id', 'date_of_purchase', 'product_id', 'price'])
 
-    
-    # creating list(weeks) of sunday's dates for week-wise segration along with the start and end date
+    transaction_df : pd.DataFrame = pd.concat(chunks, ignore_index=True)
 
-    # initializing start date if it's not sunday
-    if final_df['date_of_purchase'][0].isoweekday() != 7:
-        weeks : list = [final_df['date_of_purchase'][0]]
+    return transaction_df
+
+class NaturalSortKeys(object):
+    '''
+    Natural sort key of every customer id seen in the run as one integer,
+    the rank of its prefix in the high bits and its number in the low bits.
+    Ids are parsed into prefix and number once (vectorized) and the weekly
+    files are sorted by looking the integers up.
+    Ids that are not a non-digit prefix followed by digits are irregular
+    and sorted with the generic regex key.
+    '''
+
+    NUMBER_BITS : int = 50
+    MAX_PREFIXES : int = 2 ** 12
+
+    def __init__(self):
+        self.prefixes : dict = {}
+        self.prefix_ranks : ndarray = np.array([], dtype=np.int64)
+        self.ids : list = []
+        self.prefix_codes : ndarray = np.array([], dtype=np.int64)
+        self.numbers : ndarray = np.array([], dtype=np.int64)
+        # customer_id: integer key, -1 for irregular ids
+        self.keys : dict = {}
+
+    def parse(self, new_ids : list):
+        prefixes, numbers, regular = split_customer_ids(new_ids)
+        new_prefixes : list = [prefix for prefix in pd.unique(prefixes[regular]).tolist() if prefix not in self.prefixes]
+        if len(self.prefixes) + len(new_prefixes) > self.MAX_PREFIXES:
+            regular = regular & np.isin(prefixes, list(self.prefixes))
+            new_prefixes = []
+        self.keys.update(dict.fromkeys(np.asarray(new_ids, dtype=object)[~regular].tolist(), -1))
+        if not regular.any():
+            return
+
+        ids : list = np.asarray(new_ids, dtype=object)[regular].tolist()
+        self.prefixes.update(zip(new_prefixes, range(len(self.prefixes), len(self.prefixes) + len(new_prefixes))))
+        prefix_codes : ndarray = pd.Series(prefixes[regular], dtype=object).map(self.prefixes).to_numpy(dtype=np.int64)
+        numbers = numbers[regular]
+        self.ids += ids
+        self.prefix_codes = np.concatenate([self.prefix_codes, prefix_codes])
+        self.numbers = np.concatenate([self.numbers, numbers])
+
+        # a new prefix can move the rank of known ones, every key is computed again then
+        if new_prefixes:
+            self.prefix_ranks = np.empty(len(self.prefixes), dtype=np.int64)
+            self.prefix_ranks[[self.prefixes[prefix] for prefix in sorted(self.prefixes)]] = np.arange(len(self.prefixes))
+            ids, prefix_codes, numbers = self.ids, self.prefix_codes, self.numbers
+        self.keys.update(zip(ids, ((self.prefix_ranks[prefix_codes] << self.NUMBER_BITS) | numbers).tolist()))
+
+    def sort(self, customers : list) -> list:
+        keys : ndarray = self.lookup(customers)
+        if (keys == -2).any():
+            self.parse(list(set(np.asarray(customers, dtype=object)[keys == -2].tolist())))
+            keys = self.lookup(customers)
+
+        # generic key for every id when some are irregular, the regular ones split without regex
+        if (keys == -1).any():
+            generic : list = [
+                alphanumeric_key(customer) if key == -1 else regular_key(customer)
+                for customer, key in zip(customers, keys.tolist())
+            ]
+            return [customers[position] for position in sorted(range(len(customers)), key=generic.__getitem__)]
+
+        # stable integer sort, equal keys (C012 and C12) keep the input order like sorted()
+        return [customers[position] for position in np.argsort(keys, kind='stable').tolist()]
+
+    def lookup(self, customers : list) -> ndarray:
+        # integer key of every id, -2 for ids not parsed yet
+        return np.fromiter(map(self.keys.get, customers, itertools.repeat(-2)), dtype=np.int64, count=len(customers))
+
+
+def split_customer_ids(customers : list) -> tuple:
+    '''
+    Split customer ids into a non-digit prefix and a number of up to 15 digits (so
+    that it fits below the prefix bits of NaturalSortKeys), vectorized over the ids
+
+            Parameters:
+                    customers (list): list of customer_ids
+
+            Returns:
+                    prefixes (ndarray), numbers (ndarray), regular (ndarray): prefix, number
+                    (0 for irregular ids) and whether each id has that form
+    '''
+
+    if pa is not None:
+        parts = pc.extract_regex(pa.array(customers, type=pa.string()), r'^(?P<prefix>[^0-9]*)(?P<number>[0-9]{1,15})$')
+        valid = pc.is_valid(parts)
+        regular : ndarray = valid.to_numpy(zero_copy_only=False)
+        prefixes : ndarray = np.asarray(pc.if_else(valid, parts.field('prefix'), '').to_pylist(), dtype=object)
+        numbers : ndarray = pc.cast(pc.if_else(valid, parts.field('number'), '0'), pa.int64()).to_numpy(zero_copy_only=False)
     else:
-        weeks = []
-    
-    # variable to remove duplicate dates (by storing previous date and check with it)
-    prev_date : str = str(final_df['date_of_purchase'][0])
-    
-    # checking for sundays
-    for element in final_df['date_of_purchase']:
-        if element.isoweekday() == 7 and prev_date != str(element):
-            weeks.append(element)
-            prev_date = str(element)
+        parts : pd.DataFrame = pd.Series(customers, dtype=object).str.extract(r'^([^0-9]*)([0-9]{1,15})\Z')
+        regular : ndarray = parts[1].notna().to_numpy()
+        prefixes : ndarray = parts[0].fillna('').to_numpy(dtype=object)
+        numbers : ndarray = parts[1].fillna('0').astype(np.int64).to_numpy()
 
-    # appending end date if it's not sunday
-    if final_df['date_of_purchase'][len(final_df)-1].isoweekday() != 7:
-        weeks.append(final_df['date_of_purchase'][len(final_df)-1])
+    # prefixes made of other unicode digits are turned into numbers by the generic key
+    digit_prefixes : list = [prefix for prefix in pd.unique(prefixes).tolist() if prefix.isdigit()]
+    return prefixes, numbers, regular & ~np.isin(prefixes, digit_prefixes)
 
-    logging.info('Iteration for Weekly Separation of DataFrame')
-    # iterating over the weeks variable for weekly separation and passing it to generate_json() function 
-    for date_index in range(len(weeks)-1):
-        
-        if date_index == 0:
-            generate_json(final_df[(final_df['date_of_purchase'] >= weeks[date_index]) & (final_df['date_of_purchase'] <= weeks[date_index + 1])], str(weeks[date_index + 1]), params) 
-        else:
-            generate_json(final_df[(final_df['date_of_purchase'] > weeks[date_index]) & (final_df['date_of_purchase'] <= weeks[date_index + 1])], str(weeks[date_index + 1]), params)
 
+def regular_key(key : str) -> list:
+    '''
+    Generic natural sort key of a regular id (non-digit prefix followed by digits)
+    '''
+    prefix : str = key.rstrip('0123456789')
+    return [prefix, int(key[len(prefix):]), '']
 
 
-def merge_dataframes(product_df : pd.DataFrame, customer_df : pd.DataFrame, transaction_df : pd.DataFrame) -> pd.DataFrame:
-    
+def alphanumeric_key(key : str) -> list:
     '''
-    Merging relevant columns of product and customer dataframe with transaction dataframe.
+    Generic natural sort key: the id split into text and integer parts
+    '''
+    # converting numbers(string) to int after split
+    return [int(text) if text.isdigit() else text for text in re.split('([0-9]+)', key)]
+
+
+# parsed customer ids, shared by the weekly files of the run
+natural_sort_keys : NaturalSortKeys = NaturalSortKeys()
+
+
+def sorted_alphanumeric_Ids(customers : list) -> list:
+    '''
+    Sort the AlphaNumeric Customer Ids(String)
 
             Parameters:
-                    product_df (Pandas: DataFrame): Products dataframe
-                    customer_df (Pandas: DataFrame): Customers dataframe
-                    transaction_df (Pandas: DataFrame): Transactions dataframe
+                    customers (list): list of customer_ids
 
             Returns:
-                    final_df (Pandas: DataFrame): final merged dataframe
+                    sorted customers (list): list of sorted customer_ids
     '''
+    return natural_sort_keys.sort(list(customers))
 
-    logging.info('Inside merge_dataframes() function')
 
-    logging.info('Merging relevant Product Columns to transactions dataframe')
-    # merging transactions dataframe with "product_category" column of product dataframe on same product_id
-    intermediate_df : pd.DataFrame = transaction_df.merge(product_df[["product_id", "product_category"]], on="product_id", how="left")
+def output_values(values : pd.Series, order : ndarray) -> ndarray:
+    '''
+    Values of a column in the given row order as Python objects, missing values as None
+    so every JSON encoder writes them as null
+    '''
+    values = values.to_numpy(dtype=object)[order]
+    values[pd.isna(values)] = None
+    return values
 
-    logging.info('Merging relevant Customer Columns to transactions dataframe')
-    # merging resultant dataframe with "loyalty_score" column of customer dataframe on same customer_id
-    final_df : pd.DataFrame = intermediate_df.merge(customer_df[["customer_id", "loyalty_score"]], on="customer_id", how="left")
-    
-    return final_df
 
+def aggregate_customers(df : pd.DataFrame) -> Iterator[tuple]:
 
-def main():
-    
-    # logging configuration
-    configure_logging()
+    '''
+    Aggregate the weekly data per customer in a single grouped pass, yielding the
+    output record of each customer (in natural customer_id order) only when it is consumed
 
-    logging.info('Getting default or input arguments')
-    # get parameters
-    params : dict = get_params()
+            Parameters:
+                    df (Pandas: DataFrame): final weekly dataframe
 
-    # reading the customer and product csv files in dataframe
-    customer_df, product_df = read_csv_files(params)
+            Returns:
+                    records (Iterator: tuple): (customer_id, record dict) pairs in output order
+    '''
 
-    # reading transaction directories in a list
-    logging.info('Listing all the directories inside '+ str(params["transactions_location"]))
-    transaction_dirs : list = os.listdir(str(params["transactions_location"]))
+    logging.info('Inside aggregate_customers() function')
 
-    # reading transactions json file in dataframe
-    transaction_df : pd.DataFrame = read_transaction_json_files(transaction_dirs, params)
+    # factorizing customer ids (in order of first appearance) to group rows by integer codes
+    codes, uniques = pd.factorize(df['customer_id'])
 
-    # merge product and customer dataframes to transaction dataframe for product_category and loyalty_score
-    final_df : pd.DataFrame = merge_dataframes(product_df, customer_df, transaction_df)
+    # stable sort keeps the rows of every customer in the same order as in the weekly dataframe, rows without customer_id are left out
+    known : ndarray = np.flatnonzero(codes >= 0)
+    order : ndarray = known[np.argsort(codes[known], kind='stable')]
+    counts : ndarray = np.bincount(codes[known], minlength=len(uniques))
+    ends : list = np.cumsum(counts).tolist()
+    starts : list = (np.cumsum(counts) - counts).tolist()
 
-    # week-wise segregation
-    segregate_weekly(final_df, params)
+    product_ids : ndarray = output_values(df['product_id'], order)
+    product_categories : ndarray = output_values(df['product_category'], order)
+    loyalty_scores : ndarray = output_values(df['loyalty_score'], order)
+
+    #sort customers
+    customers : list = sorted_alphanumeric_Ids(list(uniques))
+
+    for customer, code in zip(customers, pd.Index(uniques).get_indexer(customers).tolist()):
+        start, end = starts[code], ends[code]
+        # first row of a customer only initialises the lists, loyalty_score is taken from the last row
+        yield customer, {
+            'purchase_count': end - start - 1,
+            'loyalty_score': loyalty_scores[end - 1],
+            'product_id': product_ids[start + 1:end].tolist(),
+            'product_category': product_categories[start + 1:end].tolist()
+        }
+
+
+def week_file_name(name : str, params : dict = None) -> str:
+    '''
+    Name of the output file of a week
+
+            Parameters:
+                    name (str): week ending date, optionally followed by a time
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    file name (str): Week_<<sunday_date>>.<<json|jsonl|parquet>>, with .gz appended for gzipped JSON
+    '''
+
+    params = params or {}
+    output_format : str = params.get('output_format') or 'json'
+    compressed : bool = bool(params.get('gzip_output')) and output_format != 'parquet'
+    return 'Week_' + str(name).split(' ')[0] + '.' + output_format + ('.gz' if compressed else '')
+
+
+def get_json_encoder(params : dict) -> Callable[[object], bytes]:
+    '''
+    JSON encoder for the weekly output: pretty (indent 4) by default, compact with
+    --compact_json, using orjson for compact output when requested and installed.
+
+            Parameters:
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    encoder (Callable): function encoding a value to UTF-8 JSON bytes
+    '''
+
+    compact : bool = bool(params.get('compact_json'))
+    backend : str = params.get('json_encoder') or 'json'
+
+    if compact and backend in ('orjson', 'auto'):
+        if orjson is not None:
+            # missing values are already None in the records, so both encoders write null
+            return orjson.dumps
+        logging.info('orjson is not installed, using json encoder')
+
+    if compact:
+        return lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return lambda value: json.dumps(value, ensure_ascii=False, indent=4).encode('utf-8')
+
+
+def open_output(path : str, params : dict):
+    '''
+    Open an output file for binary writing, gzipped with --gzip_output
+
+            Parameters:
+                    path (str): output file path
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    file object
+    '''
+
+    return gzip.open(path, 'wb', compresslevel=6) if params.get('gzip_output') else open(path, 'wb')
+
+
+def write_json_output(records : Iterator[tuple], path : str, params : dict):
+    '''
+    Stream a dict-of-customers JSON file customer by customer,
+    so the whole output dictionary is never built in memory.
+
+            Parameters:
+                    records (Iterator: tuple): (customer_id, record dict) pairs in output order
+                    path (str): output file path
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    encode : Callable[[object], bytes] = get_json_encoder(params)
+    pretty : bool = not params.get('compact_json')
+
+    # same layout as json.dump(output_dict, f, indent=4) in pretty mode
+    first_separator : bytes = b'\n    ' if pretty else b''
+    separator : bytes = first_separator
+
+    with open_output(path, params) as f:
+        f.write(b'{')
+        for customer, record in records:
+            if pretty:
+                f.write(separator + encode(customer) + b': ' + encode(record).replace(b'\n', b'\n    '))
+                separator = b',\n    '
+            else:
+                f.write(separator + encode(customer) + b':' + encode(record))
+                separator = b','
+        if pretty and separator != first_separator:
+            f.write(b'\n')
+        f.write(b'}')
+
+
+def write_jsonl_output(records : Iterator[tuple], path : str, params : dict):
+    '''
+    Write one compact JSON record per customer and line (JSON Lines),
+    so consumers can split and stream the file.
+
+            Parameters:
+                    records (Iterator: tuple): (customer_id, record dict) pairs in output order
+                    path (str): output file path
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    encode : Callable[[object], bytes] = get_json_encoder(dict(params, compact_json=True))
+
+    with open_output(path, params) as f:
+        for customer, record in records:
+            f.write(encode(dict({'customer_id': customer}, **record)) + b'\n')
+
+
+def write_parquet_output(records : Iterator[tuple], path : str, params : dict):
+    '''
+    Write one Parquet row per customer with product_id and product_category list columns
+
+            Parameters:
+                    records (Iterator: tuple): (customer_id, record dict) pairs in output order
+                    path (str): output file path
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    rows : list = [dict({'customer_id': customer}, **record) for customer, record in records]
+    output_df : pd.DataFrame = pd.DataFrame(rows, columns=['customer_id', 'purchase_count', 'loyalty_score', 'product_id', 'product_category'])
+    output_df.to_parquet(path, index=False, compression='gzip' if params.get('gzip_output') else 'snappy')
+
+
+# writer of each --output_format
+OUTPUT_WRITERS : dict = {
+    'json': write_json_output,
+    'jsonl': write_jsonl_output,
+    'parquet': write_parquet_output
+}
+
+
+def write_week(records : Iterator[tuple], name : str, params : dict):
+
+    '''
+    Write the customer records of a week with the writer of --output_format
+
+            Parameters:
+                    records (Iterator: tuple): (customer_id, record dict) pairs in output order
+                    name (str): week ending date
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    # checking if the given directory already present in the system (if not creating it)
+    if os.path.exists(params['output_location']) == False:
+        try:
+            os.makedirs(params['output_location'], exist_ok=True)
+        except OSError as error:
+            logging.error(error)
+
+    logging.info('Storing ' + week_file_name(name, params) + ' file')
+
+    path : str = str(params['output_location']) + week_file_name(name, params)
+    writer : Callable = OUTPUT_WRITERS[params.get('output_format') or 'json']
+
+    try:
+        # writing customers to a temporary file renamed to Week_<<sunday_date>>.<<format>> once complete
+        writer(records, path + '.tmp', params)
+        os.replace(path + '.tmp', path)
+    except IOError as error:
+        logging.error(error)
+
+
+@instrument('generate_json', label_arg=1, rows_arg=0)
+def generate_json(df : pd.DataFrame, name : str, params : dict):
+
+    '''
+    Create JSON files using weekly data
+
+            Parameters:
+                    df (Pandas: DataFrame): final weekly dataframe
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    logging.info('Inside generate_json() Function')
+
+    # per customer lists and loyalty_score grouped in one pass over the weekly dataframe, each record built only when it is written
+    write_week(aggregate_customers(df), name, params)
+
+    # keeping the aggregate store in step with the weekly files
+    if params.get('aggregate_location'):
+        update_aggregate_store(df, name, params)
+
+
+@instrument('segregate_weekly', rows_arg=0)
+def segregate_weekly(final_df : pd.DataFrame, params : dict):
+
+    '''
+    Segregate the DataFrame Week-wise.
+
+            Parameters:
+                    final_df (Pandas: DataFrame): Final DataFrame with whole data
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    logging.info('Inside segregate_weekly() function')
+
+    # converting the dataframe object to DateTime type Format
+    final_df['date_of_purchase'] = parse_purchase_dates(final_df['date_of_purchase'])
+
+    logging.info('Sorting final dataframe date-wise')
+    # sorting the dataframe date-wise, stable so the rows of a date keep their file order like the streaming and incremental paths
+    final_df = final_df.sort_values(by='date_of_purchase', kind='stable')
+
+    dates : pd.Series = final_df['date_of_purchase']
+    if dates.empty:
+        logging.info('No transactions to segregate')
+        return
+
+    # weeks end on every Sunday present in the data, the last one on the last date
+    sundays : ndarray = np.unique(dates[dates.dt.dayofweek == 6].to_numpy())
+    week_ending : pd.Series = week_ending_dates(dates, sundays, dates.max())
+
+    logging.info('Iteration for Weekly Separation of DataFrame')
+    # single grouping pass for weekly separation, passing each week to generate_json() function
+    for week, week_df in final_df.groupby(week_ending, sort=True):
+        generate_json(week_df, str(week), params)
+
+
+def parse_purchase_dates(dates : pd.Series, errors : str = 'raise') -> pd.Series:
+    '''
+    Convert date_of_purchase values to the date (without time) they fall on
+
+            Parameters:
+                    dates (Pandas: Series): date_of_purchase values like "2018-12-01 15:50:00" or datetime64
+                    errors (str): 'raise' for invalid dates, or 'coerce' to turn them into NaT
+
+            Returns:
+                    dates (Pandas: Series): datetime64 dates
+    '''
+
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.dt.normalize()
+    dates = dates.astype(str)
+    if pa is not None:
+        # the arrow kernel splits without a python call per row
+        days = pc.list_element(pc.split_pattern(pa.array(dates, type=pa.string()), ' ', max_splits=1), 0)
+        dates = pd.Series(days, dtype=pd.ArrowDtype(pa.string()), index=dates.index)
+    else:
+        dates = dates.str.split(' ', n=1).str[0]
+    return pd.to_datetime(dates, format='%Y-%m-%d', errors=errors)
+
+
+def parse_purchase_timestamps(dates : pd.Series) -> pd.Series:
+    '''
+    Convert date_of_purchase values to datetime64 keeping their time. Values only
+    parse_purchase_dates() accepts (e.g. "2018-12-01") are kept at midnight and the
+    ones it rejects become NaT, so both accept the same values.
+
+            Parameters:
+                    dates (Pandas: Series): date_of_purchase values like "2018-12-01 15:50:00" or datetime64
+
+            Returns:
+                    dates (Pandas: Series): datetime64 timestamps
+    '''
+
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    timestamps : pd.Series = pd.to_datetime(dates, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    failed : pd.Series = timestamps.isna() & dates.notna()
+    if failed.any():
+        timestamps[failed] = parse_purchase_dates(dates[failed], errors='coerce')
+    return timestamps
+
+
+def week_ending_dates(dates : pd.Series, sundays : ndarray, last_date : pd.Timestamp) -> pd.Series:
+    '''
+    Assign each date to the week it is reported in: the first Sunday
+    present in the data on or after it, or the last date for the final partial week.
+
+            Parameters:
+                    dates (Pandas: Series): datetime64 purchase dates
+                    sundays (ndarray): sorted unique Sundays present in the data
+                    last_date (Pandas: Timestamp): last date of the data
+
+            Returns:
+                    week_ending (Pandas: Series): week ending date of every row
+    '''
+
+    boundaries : pd.DatetimeIndex = pd.DatetimeIndex(sundays).append(pd.DatetimeIndex([last_date]))
+    positions : ndarray = boundaries[:-1].searchsorted(pd.DatetimeIndex(dates), side='left')
+    return pd.Series(boundaries[positions], index=dates.index)
+
+
+def write_weeks(df : pd.DataFrame, params : dict):
+    '''
+    Generate one JSON file per week_ending value of the dataframe
+
+            Parameters:
+                    df (Pandas: DataFrame): dataframe with a week_ending column
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    for week_ending, week_df in df.groupby('week_ending', sort=True):
+        generate_json(week_df.sort_values(by='date_of_purchase', kind='stable'), str(week_ending), params)
+
+
+@instrument('segregate_weekly_streaming')
+def segregate_weekly_streaming(customer_df : pd.DataFrame, product_df : pd.DataFrame, transaction_dirs : list, params : dict):
+    '''
+    Merge and segregate the transactions week-wise chunk by chunk,
+    writing each week as soon as no later chunk can add rows to it.
+    Transaction directories are expected in date order.
+
+            Parameters:
+                    customer_df (Pandas: DataFrame): Customers dataframe
+                    product_df (Pandas: DataFrame): Products dataframe
+                    transaction_dirs (list): list of directories containing transactions.json file, in date order
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    logging.info('Inside segregate_weekly_streaming() function')
+
+    # rows of weeks which can still receive data from later chunks
+    pending_df : pd.DataFrame = None
+
+    # dimension lookups built once for all the chunks
+    lookups : list = [DimensionLookup(product_df, 'product_id', ['product_category']), DimensionLookup(customer_df, 'customer_id', ['loyalty_score'])]
+
+    for transaction_df in iter_transaction_chunks(transaction_dirs, params):
+
+        chunk_df : pd.DataFrame = prepare_final_df(product_df, customer_df, transaction_df, params, lookups)
+        chunk_df['date_of_purchase'] = parse_purchase_dates(chunk_df['date_of_purchase'])
+
+        pending_df = chunk_df if pending_df is None else pd.concat([pending_df, chunk_df], ignore_index=True)
+
+        # Sundays before the current chunk can not receive more rows, so their weeks are complete
+        chunk_start : pd.Timestamp = chunk_df['date_of_purchase'].min()
+        dates : pd.Series = pending_df['date_of_purchase']
+        closed_sundays : ndarray = np.unique(dates[(dates.dt.dayofweek == 6) & (dates < chunk_start)].to_numpy())
+        if len(closed_sundays) == 0:
+            continue
+
+        complete : pd.Series = dates <= closed_sundays[-1]
+        complete_df : pd.DataFrame = pending_df[complete].copy()
+        complete_df['week_ending'] = week_ending_dates(complete_df['date_of_purchase'], closed_sundays, closed_sundays[-1])
+
+        logging.info('Writing completed weeks up to ' + str(closed_sundays[-1]).split('T')[0])
+        write_weeks(complete_df, params)
+
+        pending_df = pending_df[~complete].reset_index(drop=True)
+
+    if pending_df is None or pending_df.empty:
+        return
+
+    # remaining weeks, the last of them ending on the last date of the data
+    dates = pending_df['date_of_purchase']
+    pending_df['week_ending'] = week_ending_dates(dates, np.unique(dates[dates.dt.dayofweek == 6].to_numpy()), dates.max())
+    write_weeks(pending_df, params)
+
+
+def partition_date(transaction : str) -> datetime:
+    '''
+    Date of a d=YYYY-MM-DD transaction partition directory
+
+            Parameters:
+                    transaction (str): directory name
+
+            Returns:
+                    date (datetime): date of the partition, None if the name is not a day partition
+    '''
+
+    try:
+        return datetime.strptime(str(transaction).rstrip('/').split('d=', 1)[1], '%Y-%m-%d')
+    except (IndexError, ValueError):
+        return None
+
+
+def list_transaction_dirs(params : dict) -> list:
+    '''
+    List the d=YYYY-MM-DD partitions of the transactions location in date order,
+    keeping only those inside the --start_date/--end_date or --weeks window.
+    Entries which are not day partitions or have no transactions.json file are skipped.
+
+            Parameters:
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    transaction_dirs (list): sorted list of directories containing transactions.json file
+    '''
+
+    logging.info('Listing all the directories inside '+ str(params["transactions_location"]))
+
+    try:
+        entries : list = os.listdir(str(params["transactions_location"]))
+    except OSError as error:
+        logging.error(error)
+        return []
+
+    partitions : list = []
+    for transaction in entries:
+        date : datetime = partition_date(transaction)
+        if date is None:
+            logging.info('Skipping ' + str(transaction) + ', not a d=YYYY-MM-DD partition')
+            continue
+        partitions.append((date, transaction))
+    partitions.sort()
+
+    if not partitions:
+        return []
+
+    # window of partition dates to read, both ends included
+    start_date : datetime = datetime.strptime(params['start_date'], '%Y-%m-%d') if params.get('start_date') else None
+    end_date : datetime = datetime.strptime(params['end_date'], '%Y-%m-%d') if params.get('end_date') else None
+    if params.get('weeks'):
+        # from the Monday of the N-th last week up to the Sunday ending the week of --end_date, or of the latest partition
+        last_date : datetime = end_date if end_date is not None else partitions[-1][0]
+        last_sunday : datetime = last_date + timedelta(days=6 - last_date.weekday())
+        weeks_start : datetime = last_sunday - timedelta(days=7 * int(params['weeks']) - 1)
+        start_date = weeks_start if start_date is None else max(start_date, weeks_start)
+
+    transaction_dirs : list = []
+    for date, transaction in partitions:
+        if (start_date is not None and date < start_date) or (end_date is not None and date > end_date):
+            continue
+        if not os.path.isfile(str(params['transactions_location']) + str(transaction) + '/transactions.json'):
+            logging.error('Skipping ' + str(transaction) + ', transactions.json file is missing')
+            continue
+        transaction_dirs.append(transaction)
+
+    logging.info('Reading ' + str(len(transaction_dirs)) + ' of ' + str(len(partitions)) + ' transaction partitions')
+    return transaction_dirs
+
+
+def file_fingerprint(path : str, previous : dict = None) -> dict:
+    '''
+    Size, modification time and content hash of a file. The hash is only
+    recomputed when size or modification time differ from the previous fingerprint.
+
+            Parameters:
+                    path (str): file path
+                    previous (dict): fingerprint recorded by an earlier run
+
+            Returns:
+                    fingerprint (dict): path, size, mtime and hash of the file
+    '''
+
+    stat : os.stat_result = os.stat(path)
+    if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+        return previous
+
+    content_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            content_hash.update(block)
+
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': content_hash.hexdigest()}
+
+
+def load_manifest(path : str) -> dict:
+    '''
+    Load the manifest of processed partitions and written weeks
+
+            Parameters:
+                    path (str): manifest file path
+
+            Returns:
+                    manifest (dict): manifest of the previous run, empty if there is none
+    '''
+
+    empty_manifest : dict = {'dimensions': {}, 'partitions': {}, 'weeks': {}}
+    if not os.path.exists(path):
+        return empty_manifest
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError) as error:
+        logging.error('Ignoring unreadable manifest ' + path + ': ' + str(error))
+        return empty_manifest
+
+
+def save_manifest(manifest : dict, path : str):
+    '''
+    Atomically write the manifest of processed partitions and written weeks
+
+            Parameters:
+                    manifest (dict): manifest of the current run
+                    path (str): manifest file path
+
+            Returns:
+                    Nothing
+    '''
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(path + '.tmp', path)
+
+
+# parameters changing the content of the weekly files (with their defaults), any change to them rewrites every week
+OUTPUT_PARAMS : dict = {
+    'output_format': 'json',
+    'compact_json': False,
+    'json_encoder': 'json',
+    'gzip_output': False,
+    'compact_types': False,
+    'skip_validation': False,
+    'aggregate_location': None
+}
+
+
+@instrument('segregate_weekly_incremental')
+def segregate_weekly_incremental(customer_df : pd.DataFrame, product_df : pd.DataFrame, transaction_dirs : list, params : dict) -> list:
+    '''
+    Regenerate only the weeks whose partitions (or customers/products files)
+    changed since the previous run, as recorded in the manifest, or every
+    week when the parameters changing the files' content (OUTPUT_PARAMS) did.
+    Rows are assigned to weeks by the date of their d=YYYY-MM-DD partition.
+
+            Parameters:
+                    customer_df (Pandas: DataFrame): Customers dataframe
+                    product_df (Pandas: DataFrame): Products dataframe
+                    transaction_dirs (list): list of directories containing transactions.json file
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    written weeks (list): file names of the weeks regenerated by this run
+    '''
+
+    logging.info('Inside segregate_weekly_incremental() function')
+
+    manifest_path : str = params.get('manifest_location') or os.path.join(str(params['output_location']), '_manifest.json')
+    previous : dict = load_manifest(manifest_path)
+
+    # customers and products feed every week, any change to them rewrites everything
+    dimensions : dict = {
+        name: file_fingerprint(str(params[name]), previous['dimensions'].get(name))
+        for name in ['customers_location', 'products_location']
+    }
+    # compared by content hash, a touched but unchanged file rewrites nothing
+    dimensions_changed : bool = any(
+        fingerprint['hash'] != previous['dimensions'].get(name, {}).get('hash')
+        for name, fingerprint in dimensions.items()
+    )
+
+    output_params : dict = {name: params.get(name) or default for name, default in OUTPUT_PARAMS.items()}
+    output_params_changed : bool = output_params != previous.get('output_params')
+
+    partitions : dict = {}
+    dates : dict = {}
+    for transaction in sorted(transaction_dirs):
+        date : datetime = partition_date(transaction)
+        if date is None:
+            logging.info('Skipping ' + str(transaction) + ', not a d=YYYY-MM-DD partition')
+            continue
+        path : str = str(params['transactions_location']) + str(transaction) + '/transactions.json'
+        partitions[transaction] = file_fingerprint(path, previous['partitions'].get(transaction))
+        dates[transaction] = date
+
+    if not partitions:
+        logging.info('No transaction partitions to process')
+        return []
+
+    # week of every partition, using the same Sunday boundaries as segregate_weekly()
+    partition_dates : pd.Series = pd.Series(list(dates.values()), index=list(dates.keys()), dtype='datetime64[ns]')
+    sundays : ndarray = np.unique(partition_dates[partition_dates.dt.dayofweek == 6].to_numpy())
+    partition_weeks : pd.Series = week_ending_dates(partition_dates, sundays, partition_dates.max())
+
+    weeks : dict = {}
+    week_endings : dict = {}
+    for transaction, week_ending in partition_weeks.items():
+        weeks.setdefault(week_file_name(str(week_ending), params), {'partitions': {}})['partitions'][transaction] = partitions[transaction]['hash']
+        week_endings[week_file_name(str(week_ending), params)] = str(week_ending)
+
+    # a week is regenerated when its partitions or their contents differ from the last run
+    affected : list = [
+        name for name, week in weeks.items()
+        if dimensions_changed
+        or output_params_changed
+        or previous['weeks'].get(name, {}).get('partitions') != week['partitions']
+        or not os.path.exists(str(params['output_location']) + name)
+    ]
+    logging.info(str(len(affected)) + ' of ' + str(len(weeks)) + ' weeks need to be regenerated')
+
+    # each affected week is read from its own partitions, so a row dated outside its partition's week
+    # stays in that week and weeks which are up to date are never rewritten
+    for name in sorted(affected):
+        transaction_df : pd.DataFrame = read_transaction_json_files(sorted(weeks[name]['partitions']), params)
+        final_df : pd.DataFrame = prepare_final_df(product_df, customer_df, transaction_df, params)
+        final_df['date_of_purchase'] = parse_purchase_dates(final_df['date_of_purchase'])
+        generate_json(final_df.sort_values(by='date_of_purchase', kind='stable'), week_endings[name], params)
+
+    # weeks written by an earlier run that no longer exist, e.g. a partial last week which got extended
+    for name in set(previous['weeks']) - set(weeks):
+        logging.info('Removing stale ' + name + ' file')
+        if os.path.exists(str(params['output_location']) + name):
+            os.remove(str(params['output_location']) + name)
+        if params.get('aggregate_location'):
+            aggregate_path : str = os.path.join(str(params['aggregate_location']), aggregate_file_name(name.split('_')[1][:10]))
+            if os.path.exists(aggregate_path):
+                os.remove(aggregate_path)
+
+    save_manifest({
+        'dimensions': dimensions,
+        'output_params': output_params,
+        'partitions': partitions,
+        'weeks': weeks
+    }, manifest_path)
+
+    return affected
+
+
+# rolling window queries group the stored product rows by these columns
+AGGREGATE_LEVELS : dict = {
+    'customer': ['customer_id'],
+    'category': ['customer_id', 'product_category'],
+    'product': ['customer_id', 'product_id', 'product_category']
+}
+
+
+def aggregate_file_name(name : str) -> str:
+    '''
+    Name of the aggregate store file of a week
+
+            Parameters:
+                    name (str): week ending date, optionally followed by a time
+
+            Returns:
+                    file name (str): week=<<sunday_date>>.parquet
+    '''
+
+    return 'week=' + str(name).split(' ')[0] + '.parquet'
+
+
+def build_week_aggregates(df : pd.DataFrame) -> pd.DataFrame:
+    '''
+    Purchase count and spend of every customer and product of a week.
+    Unlike the weekly JSON every purchased item is counted.
+
+            Parameters:
+                    df (Pandas: DataFrame): final weekly dataframe
+
+            Returns:
+                    aggregates (Pandas: DataFrame): customer_id, product_id, product_category, purchase_count and spend
+    '''
+
+    # plain object columns, compact_types categories differ from week to week
+    items : pd.DataFrame = pd.DataFrame({
+        'customer_id': df['customer_id'].astype(object),
+        'product_id': df['product_id'].astype(object),
+        'product_category': df['product_category'].astype(object),
+        'spend': pd.to_numeric(df['price'], errors='coerce').astype('float64')
+    }).dropna(subset=['product_id'])
+
+    return (items.groupby(['customer_id', 'product_id', 'product_category'], sort=True, dropna=False)
+                 .agg(purchase_count=('spend', 'size'), spend=('spend', 'sum'))
+                 .reset_index())
+
+
+def update_aggregate_store(df : pd.DataFrame, name : str, params : dict):
+    '''
+    Replace the aggregates of one week in the aggregate store
+
+            Parameters:
+                    df (Pandas: DataFrame): final weekly dataframe
+                    name (str): week ending date
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    os.makedirs(str(params['aggregate_location']), exist_ok=True)
+    path : str = os.path.join(str(params['aggregate_location']), aggregate_file_name(name))
+    logging.info('Storing aggregates in ' + path)
+
+    try:
+        build_week_aggregates(df).to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+    except IOError as error:
+        logging.error(error)
+        return
+
+    # stored weeks ending inside this week's dates, e.g. a partial last week which got extended, would be counted twice
+    dates : pd.Series = parse_purchase_dates(df['date_of_purchase'], errors='coerce')
+    week_ending : pd.Timestamp = pd.Timestamp(str(name).split(' ')[0])
+    for week in stored_weeks(str(params['aggregate_location'])):
+        if dates.min() <= week < week_ending:
+            logging.info('Removing overlapping ' + aggregate_file_name(str(week.date())) + ' aggregates')
+            os.remove(os.path.join(str(params['aggregate_location']), aggregate_file_name(str(week.date()))))
+
+
+def stored_weeks(aggregate_location : str) -> list:
+    '''
+    Week ending dates present in the aggregate store, in order
+    '''
+
+    if not os.path.isdir(aggregate_location):
+        return []
+    weeks : list = [re.fullmatch(r'week=(\d{4}-\d{2}-\d{2})\.parquet', name) for name in os.listdir(aggregate_location)]
+    return sorted(pd.Timestamp(week.group(1)) for week in weeks if week)
+
+
+def rolling_aggregates(aggregate_location : str, weeks : int = 4, end_week : str = None, level : str = 'category', customer_ids : list = None) -> pd.DataFrame:
+    '''
+    Per customer purchase counts and spend over the last weeks of the aggregate store,
+    read without touching the raw transactions.
+
+            Parameters:
+                    aggregate_location (str): directory of the aggregate store
+                    weeks (int): window length in weeks, e.g. 4, 13 or 52
+                    end_week (str): last week ending date of the window, defaults to the latest stored week
+                    level (str): 'customer', 'category' or 'product'
+                    customer_ids (list): only these customers when given
+
+            Returns:
+                    aggregates (Pandas: DataFrame): columns of the level, purchase_count, spend and weeks_active
+    '''
+
+    keys : list = AGGREGATE_LEVELS[level]
+    available : list = stored_weeks(aggregate_location)
+    end : pd.Timestamp = pd.Timestamp(end_week) if end_week else (available[-1] if available else None)
+    selected : list = [week for week in available if end - pd.Timedelta(days=7 * weeks - 1) <= week <= end] if end is not None else []
+
+    # only the week files inside the window, filtered on customer_id while reading
+    filters : list = [('customer_id', 'in', list(customer_ids))] if customer_ids else None
+    frames : list = [
+        pd.read_parquet(os.path.join(aggregate_location, aggregate_file_name(str(week.date()))), filters=filters).assign(week_ending=week)
+        for week in selected
+    ]
+    if not frames:
+        return pd.DataFrame(columns=keys + ['purchase_count', 'spend', 'weeks_active'])
+
+    return (pd.concat(frames, ignore_index=True)
+              .groupby(keys, sort=True, dropna=False)
+              .agg(purchase_count=('purchase_count', 'sum'), spend=('spend', 'sum'), weeks_active=('week_ending', 'nunique'))
+              .reset_index())
+
+
+def run_rolling_query(params : dict):
+    '''
+    Answer the rolling subcommand, writing the result as CSV
+
+            Parameters:
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    logging.info('Querying ' + str(params['window']) + ' week aggregates from ' + str(params['aggregate_location']))
+    result : pd.DataFrame = rolling_aggregates(str(params['aggregate_location']), params['window'], params.get('end_week'), params['level'], params.get('customer_ids'))
+    result.to_csv(params.get('query_output') or sys.stdout, index=False)
+
+
+class Quarantine(object):
+    '''
+    Records rejected by the data-quality checks, with the reason of each
+    and the number of records per reason.
+    '''
+
+    def __init__(self):
+        self.counts : dict = {}
+        self.records : list = []
+
+    def add(self, reason : str, records : list):
+        self.counts[reason] = self.counts.get(reason, 0) + len(records)
+        self.records += [dict(record, reason=reason) for record in records]
+
+    def extend(self, other : 'Quarantine'):
+        for reason, count in other.counts.items():
+            self.counts[reason] = self.counts.get(reason, 0) + count
+        self.records += other.records
+
+    def write(self, path : str):
+        '''
+        Write the counts and the records to path
+
+                Parameters:
+                        path (str): quarantine file path
+
+                Returns:
+                        Nothing
+        '''
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'counts': self.counts, 'records': self.records}, f, indent=4, default=str)
+
+
+# quarantine of the current run, rejected records are only counted in the log while it is not set
+quarantine : Quarantine = None
+
+
+def quarantine_records(reason : str, records : list):
+    '''
+    Log and keep records rejected for reason in the quarantine of the run
+    '''
+    if not records:
+        return
+    logging.info('Quarantining ' + str(len(records)) + ' records: ' + reason)
+    if quarantine is not None:
+        quarantine.add(reason, records)
+
+
+@instrument('validate_transactions', rows_arg=0)
+def validate_transactions(final_df : pd.DataFrame, raw_df : pd.DataFrame = None) -> pd.DataFrame:
+    '''
+    Check the merged transactions for schema and referential problems with
+    vectorized masks, quarantining the failing rows with the first reason
+    they fail and returning the others with date_of_purchase parsed to dates.
+
+            Parameters:
+                    final_df (Pandas: DataFrame): final merged dataframe
+                    raw_df (Pandas: DataFrame): transactions before encoding, in the same row order, whose values are quarantined
+
+            Returns:
+                    final_df (Pandas: DataFrame): rows passing every check
+    '''
+
+    dates : pd.Series = parse_purchase_dates(final_df['date_of_purchase'], errors='coerce')
+    prices : pd.Series = final_df['price'] if pd.api.types.is_numeric_dtype(final_df['price']) else pd.to_numeric(final_df['price'], errors='coerce')
+
+    # checks in the order the reason of a row is picked
+    checks : list = [
+        ('missing_customer_id', final_df['customer_id'].isna() | (final_df['customer_id'] == '')),
+        ('invalid_date', dates.isna()),
+        ('empty_basket', final_df['product_id'].isna() & final_df['price'].isna()),
+        ('missing_product_id', final_df['product_id'].isna()),
+        ('invalid_price', prices.isna() | (prices < 0)),
+        ('unknown_customer', final_df['loyalty_score'].isna()),
+        ('unknown_product', final_df['product_category'].isna())
+    ]
+
+    rejected : ndarray = np.zeros(len(final_df), dtype=bool)
+    for reason, failed in checks:
+        failed = failed.to_numpy(dtype=bool) & ~rejected
+        if failed.any():
+            # only the few failing rows are turned into records, with the values they were read with
+            records : pd.DataFrame = (final_df if raw_df is None else raw_df)[['customer_id', 'date_of_purchase', 'product_id', 'price']].iloc[failed].astype(object)
+            quarantine_records(reason, records.where(records.notna(), None).to_dict('records'))
+            rejected |= failed
+
+    final_df = final_df.assign(date_of_purchase=dates)
+    return final_df[~rejected] if rejected.any() else final_df
+
+
+class DimensionLookup(object):
+    '''
+    Hash index over a small dimension table (products or customers), built once,
+    attaching its attributes to transaction rows by position instead of a merge.
+    Keys not found in the dimension table are counted in unmatched.
+    '''
+
+    def __init__(self, dimension_df : pd.DataFrame, key : str, columns : list):
+        duplicated : pd.Series = dimension_df[key].duplicated(keep='first')
+        if duplicated.any():
+            logging.error(str(int(duplicated.sum())) + ' duplicated ' + key + ' values in dimension table, keeping the first of each')
+            dimension_df = dimension_df[~duplicated]
+
+        self.key : str = key
+        self.index : pd.Index = pd.Index(dimension_df[key])
+        self.columns : dict = {column: dimension_df[column].array for column in columns}
+        self.unmatched : dict = {}
+
+    def attach(self, df : pd.DataFrame) -> pd.DataFrame:
+        '''
+        Add the dimension columns to df (in place) for the rows' keys
+
+                Parameters:
+                        df (Pandas: DataFrame): dataframe having the key column
+
+                Returns:
+                        df (Pandas: DataFrame): the same dataframe with the dimension columns added
+        '''
+
+        positions : ndarray = self.index.get_indexer(df[self.key])
+
+        missing : ndarray = positions == -1
+        if missing.any():
+            counts : pd.Series = df[self.key][missing].value_counts(dropna=False)
+            for value, count in counts.items():
+                self.unmatched[value] = self.unmatched.get(value, 0) + int(count)
+            logging.error(str(int(missing.sum())) + ' rows with ' + str(len(counts)) + ' unknown ' + self.key + ' values, e.g. ' + str(list(counts.index[:5])))
+
+        for column, values in self.columns.items():
+            df[column] = pd.api.extensions.take(values, positions, allow_fill=True)
+
+        return df
+
+
+def attach_dimensions(transaction_df : pd.DataFrame, product_lookup : DimensionLookup, customer_lookup : DimensionLookup) -> pd.DataFrame:
+    '''
+    Attach product_category and loyalty_score to the transactions using prebuilt lookups,
+    without copying the transaction data.
+
+            Parameters:
+                    transaction_df (Pandas: DataFrame): Transactions dataframe
+                    product_lookup (DimensionLookup): lookup of product_category by product_id
+                    customer_lookup (DimensionLookup): lookup of loyalty_score by customer_id
+
+            Returns:
+                    final_df (Pandas: DataFrame): final merged dataframe
+    '''
+
+    # new frame sharing the transaction columns, only the attached columns are allocated
+    final_df : pd.DataFrame = transaction_df.copy(deep=False).reset_index(drop=True)
+
+    logging.info('Attaching product_category to transactions dataframe')
+    product_lookup.attach(final_df)
+
+    logging.info('Attaching loyalty_score to transactions dataframe')
+    customer_lookup.attach(final_df)
+
+    return final_df
+
+
+def merge_dataframes(product_df : pd.DataFrame, customer_df : pd.DataFrame, transaction_df : pd.DataFrame) -> pd.DataFrame:
+    
+    '''
+    Merging relevant columns of product and customer dataframe with transaction dataframe.
+
+            Parameters:
+                    product_df (Pandas: DataFrame): Products dataframe
+                    customer_df (Pandas: DataFrame): Customers dataframe
+                    transaction_df (Pandas: DataFrame): Transactions dataframe
+
+            Returns:
+                    final_df (Pandas: DataFrame): final merged dataframe
+    '''
+
+    logging.info('Inside merge_dataframes() function')
+
+    # "product_category" of product dataframe on same product_id, "loyalty_score" of customer dataframe on same customer_id
+    return attach_dimensions(transaction_df, DimensionLookup(product_df, 'product_id', ['product_category']), DimensionLookup(customer_df, 'customer_id', ['loyalty_score']))
+
+
+def shared_categories(values : pd.Series, dimension : pd.Series) -> pd.CategoricalDtype:
+    '''
+    Categorical dtype holding the dimension's ids followed by any ids only seen in values,
+    so both columns share one string dictionary and join on integer codes.
+
+            Parameters:
+                    values (Pandas: Series): ids of the transactions
+                    dimension (Pandas: Series): ids of the dimension table
+
+            Returns:
+                    dtype (Pandas: CategoricalDtype): dtype covering both columns
+    '''
+
+    categories : pd.Index = pd.Index(dimension.dropna().unique())
+    if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.equals(categories):
+        return values.dtype
+    unknown : pd.Index = pd.Index(values.dropna().unique()).difference(categories)
+    return pd.CategoricalDtype(categories.append(unknown) if len(unknown) else categories)
+
+
+def encode_frames(product_df : pd.DataFrame, customer_df : pd.DataFrame, transaction_df : pd.DataFrame) -> list:
+    '''
+    Convert the dataframes to the compact schema: customer_id, product_id and
+    product_category as categoricals sharing one dictionary per id, dates as datetime64,
+    price and loyalty_score as the smallest integer type holding them.
+
+            Parameters:
+                    product_df (Pandas: DataFrame): Products dataframe
+                    customer_df (Pandas: DataFrame): Customers dataframe
+                    transaction_df (Pandas: DataFrame): Transactions dataframe
+
+            Returns:
+                    list of dataframes (list): encoded product, customer and transaction dataframes
+    '''
+
+    logging.info('Inside encode_frames() function')
+
+    product_df = product_df[['product_id', 'product_category']].copy()
+    customer_df = customer_df[['customer_id', 'loyalty_score']].copy()
+    transaction_df = transaction_df.copy()
+
+    product_dtype : pd.CategoricalDtype = shared_categories(transaction_df['product_id'], product_df['product_id'])
+    customer_dtype : pd.CategoricalDtype = shared_categories(transaction_df['customer_id'], customer_df['customer_id'])
+
+    product_df['product_id'] = product_df['product_id'].astype(product_dtype)
+    product_df['product_category'] = product_df['product_category'].astype('category')
+    customer_df['customer_id'] = customer_df['customer_id'].astype(customer_dtype)
+    customer_df['loyalty_score'] = pd.to_numeric(customer_df['loyalty_score'], downcast='integer')
+
+    transaction_df['product_id'] = transaction_df['product_id'].astype(product_dtype)
+    transaction_df['customer_id'] = transaction_df['customer_id'].astype(customer_dtype)
+    # accepting the same dates as validate_transactions() does without --compact_types
+    transaction_df['date_of_purchase'] = parse_purchase_timestamps(transaction_df['date_of_purchase'])
+    transaction_df['price'] = pd.to_numeric(transaction_df['price'], downcast='integer', errors='coerce')
+
+    return [product_df, customer_df, transaction_df]
+
+
+@instrument('merge_dataframes', rows_arg=2)
+def prepare_final_df(product_df : pd.DataFrame, customer_df : pd.DataFrame, transaction_df : pd.DataFrame, params : dict, lookups : list = None) -> pd.DataFrame:
+    '''
+    Merge the dataframes, encoding them to the compact schema first when --compact_types is given
+
+            Parameters:
+                    product_df (Pandas: DataFrame): Products dataframe
+                    customer_df (Pandas: DataFrame): Customers dataframe
+                    transaction_df (Pandas: DataFrame): Transactions dataframe
+                    params (dict): dictionary containing the input and output parameters
+                    lookups (list): product and customer DimensionLookup reused across calls
+
+            Returns:
+                    final_df (Pandas: DataFrame): final merged dataframe
+    '''
+
+    raw_df : pd.DataFrame = None
+    if params.get('compact_types'):
+        raw_df = transaction_df
+        product_df, customer_df, transaction_df = encode_frames(product_df, customer_df, transaction_df)
+        final_df : pd.DataFrame = merge_dataframes(product_df, customer_df, transaction_df)
+    elif lookups is not None:
+        final_df : pd.DataFrame = attach_dimensions(transaction_df, *lookups)
+    else:
+        final_df : pd.DataFrame = merge_dataframes(product_df, customer_df, transaction_df)
+
+    # rows failing the data-quality checks are quarantined instead of reaching the weekly files
+    if params.get('skip_validation'):
+        return final_df
+    final_df = validate_transactions(final_df, raw_df)
+
+    # unknown customers turned loyalty_score to float, once they are quarantined it gets the customers' type back
+    loyalty_dtype = customer_df['loyalty_score'].dtype
+    if final_df['loyalty_score'].dtype != loyalty_dtype and final_df['loyalty_score'].notna().all():
+        final_df = final_df.assign(loyalty_score=final_df['loyalty_score'].astype(loyalty_dtype))
+    return final_df
+
+
+@instrument('run_spark_engine')
+def run_spark_engine(params : dict):
+
+    '''
+    Run the pipeline on Spark: read the d=YYYY-MM-DD partitioned JSON with partition discovery,
+    broadcast-join products and customers, quarantine the rows failing the checks of
+    validate_transactions(), assign weeks, aggregate per customer and write the same
+    weekly outputs as the pandas engine.
+
+            Parameters:
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    logging.info('Inside run_spark_engine() function')
+
+    # pyspark is only needed for this engine
+    from pyspark.sql import SparkSession, functions as F, types as T
+
+    # unparsable dates become null instead of failing the job on the parser upgrade check
+    spark = (SparkSession.builder.master(params.get('spark_master') or 'local[*]').appName('DataTest')
+                         .config('spark.sql.legacy.timeParserPolicy', 'CORRECTED').getOrCreate())
+
+    try:
+        customers = spark.read.csv(str(params['customers_location']), header=True, inferSchema=True).select('customer_id', 'loyalty_score')
+        products = spark.read.csv(str(params['products_location']), header=True).select('product_id', 'product_category')
+
+        # only the partitions inside the date window are handed to spark
+        transaction_dirs : list = list_transaction_dirs(params)
+        if not transaction_dirs:
+            logging.info('No transactions to segregate')
+            return
+
+        # fixed schema, so a malformed line or basket nulls its own fields instead of changing the inferred types,
+        # prices are read as text and checked after the cast like the pandas engine does
+        schema = T.StructType([
+            T.StructField('customer_id', T.StringType()),
+            T.StructField('basket', T.ArrayType(T.StructType([T.StructField('product_id', T.StringType()), T.StructField('price', T.StringType())]))),
+            T.StructField('date_of_purchase', T.StringType()),
+            T.StructField('_corrupt_record', T.StringType())
+        ])
+
+        logging.info('Reading transactions with partition discovery from ' + str(params['transactions_location']))
+        # file keeps the partition order (splits are not read in it), row_id the line order inside each file
+        # and position the order inside each basket
+        transactions = (spark.read.schema(schema).option('basePath', str(params['transactions_location']))
+                        .json([str(params['transactions_location']) + str(transaction) for transaction in transaction_dirs])
+                        .withColumn('file', F.input_file_name())
+                        .withColumn('row_id', F.monotonically_increasing_id())
+                        .select('customer_id', 'date_of_purchase', '_corrupt_record', 'file', 'row_id', F.posexplode_outer('basket').alias('position', 'item'))
+                        .select('customer_id', 'date_of_purchase', '_corrupt_record', 'file', 'row_id', 'position',
+                                F.to_date(F.split('date_of_purchase', ' ', 2).getItem(0), 'yyyy-M-d').alias('day'),
+                                F.col('item.product_id').alias('product_id'), F.col('item.price').alias('price')))
+
+        # products and customers are small dimension tables, broadcast to every executor
+        final = (transactions.join(F.broadcast(products), 'product_id', 'left')
+                             .join(F.broadcast(customers), 'customer_id', 'left'))
+
+        # reason of every row, picked in the order of validate_transactions(), lines the reader could not parse
+        # at all are malformed_json and those it could only partly parse (a basket that is not a list) malformed_basket
+        price = F.col('price').cast('double')
+        reason = (F.when(F.col('_corrupt_record').isNotNull() & F.col('customer_id').isNull(), 'malformed_json')
+                   .when(F.col('_corrupt_record').isNotNull(), 'malformed_basket'))
+        if not params.get('skip_validation'):
+            reason = (reason.when(F.col('customer_id').isNull() | (F.col('customer_id') == ''), 'missing_customer_id')
+                            .when(F.col('day').isNull(), 'invalid_date')
+                            .when(F.col('product_id').isNull() & F.col('price').isNull(), 'empty_basket')
+                            .when(F.col('product_id').isNull(), 'missing_product_id')
+                            .when(price.isNull() | (price < 0), 'invalid_price')
+                            .when(F.col('loyalty_score').isNull(), 'unknown_customer')
+                            .when(F.col('product_category').isNull(), 'unknown_product'))
+        final = final.withColumn('reason', reason).cache()
+
+        # only the few rejected rows are collected to the driver
+        rejected : dict = {}
+        for row in final.where(F.col('reason').isNotNull()).orderBy('file', 'row_id', 'position').collect():
+            if row.reason in ('malformed_json', 'malformed_basket'):
+                record : dict = {'line': row._corrupt_record}
+            else:
+                record = {'customer_id': row.customer_id, 'date_of_purchase': row.date_of_purchase, 'product_id': row.product_id, 'price': row.price}
+            rejected.setdefault(row.reason, []).append(record)
+        for reason_name, records in rejected.items():
+            quarantine_records(reason_name, records)
+        final = final.where(F.col('reason').isNull() & F.col('customer_id').isNotNull() & F.col('day').isNotNull())
+
+        # week of every distinct day, computed with the same rules as segregate_weekly()
+        days : pd.Series = pd.Series(pd.to_datetime([row.day for row in final.select('day').distinct().collect()])).sort_values(ignore_index=True)
+        if days.empty:
+            logging.info('No transactions to segregate')
+            return
+        week_ending : pd.Series = week_ending_dates(days, days[days.dt.dayofweek == 6].to_numpy(), days.max())
+        weeks = spark.createDataFrame(pd.DataFrame({'day': days.dt.date, 'week_ending': week_ending.dt.strftime('%Y-%m-%d')}))
+
+        aggregated = (final.join(F.broadcast(weeks), 'day')
+                           .groupBy('week_ending', 'customer_id')
+                           .agg(F.first('loyalty_score').alias('loyalty_score'),
+                                F.sort_array(F.collect_list(F.struct('day', 'file', 'row_id', 'position', 'product_id', 'product_category'))).alias('items'))
+                           # first row of a customer only initialises the lists, as in aggregate_customers()
+                           .select('week_ending', 'customer_id', 'loyalty_score', F.expr('slice(items, 2, size(items))').alias('items'))
+                           .cache())
+
+        logging.info('Iteration for Weekly Separation of DataFrame')
+        for week in sorted(row.week_ending for row in aggregated.select('week_ending').distinct().collect()):
+            rows : dict = {row.customer_id: row for row in aggregated.where(F.col('week_ending') == week).collect()}
+            records : Iterator[tuple] = ((customer, {
+                'purchase_count': len(rows[customer].items),
+                'loyalty_score': rows[customer].loyalty_score,
+                'product_id': [item.product_id for item in rows[customer].items],
+                'product_category': [item.product_category for item in rows[customer].items]
+            }) for customer in sorted_alphanumeric_Ids(list(rows)))
+            write_week(records, week, params)
+    finally:
+        spark.stop()
+
+
+def run_pandas_engine(params : dict):
+
+    '''
+    Run the pipeline with pandas in the current process
+
+            Parameters:
+                    params (dict): dictionary containing the input and output parameters
+
+            Returns:
+                    Nothing
+    '''
+
+    logging.info('Inside run_pandas_engine() function')
+
+    # reading the customer and product csv files in dataframe
+    customer_df, product_df = read_csv_files(params)
+
+    # incremental mode, only the weeks whose partitions changed since the last run
+    if params.get('incremental'):
+        # every partition is compared with the manifest (without being read), so no date window applies
+        segregate_weekly_incremental(customer_df, product_df, list_transaction_dirs(dict(params, start_date=None, end_date=None, weeks=None)), params)
+        return
+
+    # reading the transaction directories inside the date window in a sorted list
+    transaction_dirs : list = list_transaction_dirs(params)
+
+    # streaming mode, never materialising the whole transaction history
+    if params.get('chunk_size') or params.get('max_memory'):
+        segregate_weekly_streaming(customer_df, product_df, transaction_dirs, params)
+        return
+
+    # reading transactions json file in dataframe
+    transaction_df : pd.DataFrame = read_transaction_json_files(transaction_dirs, params)
+
+    # merge product and customer dataframes to transaction dataframe for product_category and loyalty_score
+    final_df : pd.DataFrame = prepare_final_df(product_df, customer_df, transaction_df, params)
+
+    # week-wise segregation
+    segregate_weekly(final_df, params)
+
+
+# execution backends sharing the same parameters and weekly outputs
+ENGINES : dict = {
+    'pandas': run_pandas_engine,
+    'spark': run_spark_engine
+}
+
+
+def main():
+    
+    # logging configuration
+    configure_logging()
+
+    logging.info('Getting default or input arguments')
+    # get parameters
+    params : dict = get_params()
+
+    # aggregate store queries do not run the pipeline
+    if params.get('command') == 'rolling':
+        run_rolling_query(params)
+        return
+
+    # collecting per stage metrics and rejected records of this run
+    global run_report, quarantine
+    run_report = RunReport(params)
+    quarantine = Quarantine()
+    profiler : cProfile.Profile = None
+    if params.get('profile'):
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        # running the pipeline with the selected engine
+        ENGINES[params.get('engine') or 'pandas'](params)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(str(params['output_location']), exist_ok=True)
+            profiler.dump_stats(os.path.join(str(params['output_location']), '_profile.pstats'))
+            tracemalloc.stop()
+        run_report.write(params.get('report_location') or os.path.join(str(params['output_location']), '_run_report.json'))
+        run_report = None
+        if quarantine.counts:
+            logging.info('Quarantined records per reason: ' + json.dumps(quarantine.counts))
+            quarantine.write(params.get('quarantine_location') or os.path.join(str(params['output_location']), '_quarantine.json'))
+        quarantine = None
 
     logging.info('Done!')
 
@@ -5,9 +5,19 @@ Some supporting files to run test cases present in './test_files'
 '''
 
 # importing libraries
+import os
+import gzip
+import json
+import shutil
 import pytest
+from datetime import datetime
+import numpy as np
 import pandas as pd
 from solution import solution_start
+from inputs_data_generator import data_generator
+from benchmarks import suite
+from benchmarks.prefetch_reader_benchmark import SlowFileLayer
+from benchmarks import natural_sort_benchmark
 
 '''
 Test Cases for sorted_alphanumeric_Ids function
@@ -15,12 +25,23 @@ Test Cases for sorted_alphanumeric_Ids function
 @pytest.mark.parametrize('input_list, output_list', 
             [
                 (['A12', 'A21', 'A3'], ['A3', 'A12', 'A21']),   # Test Case 1
-                (['C1', 'C8', 'C4'], ['C1', 'C4', 'C8'])        # Test Case 2
+                (['C1', 'C8', 'C4'], ['C1', 'C4', 'C8']),       # Test Case 2
+                (['C10', 'C010', 'B2', '7', 'C9', 'c1'], ['7', 'B2', 'C9', 'C10', 'C010', 'c1']),                   # Test Case 3
+                (['C10', 'C2a', 'A1B2', '', 'C2', 'C1-1', 'C12\n'], ['', 'A1B2', 'C1-1', 'C2', 'C2a', 'C10', 'C12\n']) # Test Case 4
             ])
 def test_sorted_alphanumeric_Ids(input_list : list, output_list : list):
     assert solution_start.sorted_alphanumeric_Ids(input_list) == output_list
 
 
+def test_sorted_alphanumeric_Ids_matches_regex_key():
+    # random regular and irregular ids, sorted with the cached keys of earlier calls too
+    rng = np.random.default_rng(7)
+    alphabet = list('AB0123456789-')
+    for _ in range(300):
+        customers = [''.join(rng.choice(alphabet, size=rng.integers(0, 6))) for _ in range(rng.integers(0, 20))]
+        assert solution_start.sorted_alphanumeric_Ids(customers) == natural_sort_benchmark.legacy_sorted_alphanumeric_Ids(customers)
+
+
 '''
 Test Cases for separate_column_elements function
 '''
@@ -49,3 +70,544 @@ def test_merge_dataframes(product_df : pd.DataFrame, customer_df : pd.DataFrame,
     df = solution_start.merge_dataframes(product_df, customer_df, transaction_df)
     assert df.equals(final_df)
 
+
+'''
+Test Cases for read_transaction_json_files function (chunked reading)
+'''
+@pytest.mark.parametrize('chunk_size, mmap', [(1, False), (2, False), (100, False), (1, True), (100, True)])
+def test_read_transaction_json_files_chunked(tmp_path, chunk_size : int, mmap : bool):
+    lines = [
+        '{"customer_id": "C1", "basket": [{"product_id": "P40", "price": 1876}, {"product_id": "P36", "price": 1065}], "date_of_purchase": "2018-12-01 15:50:00"}',
+        '{"customer_id": "C2", "basket": [{"product_id": "P07", "price": 156}, {"product_id": "P12", "price": 1266}], "date_of_purchase": "2018-12-01 12:31:00"}'
+    ]
+    (tmp_path / 'd=2018-12-01').mkdir()
+    (tmp_path / 'd=2018-12-01' / 'transactions.json').write_text('\n'.join(lines) + '\n')
+    params = {'transactions_location': str(tmp_path) + '/', 'chunk_size': chunk_size, 'mmap': mmap}
+    tr_df = solution_start.read_transaction_json_files(['d=2018-12-01'], params)
+    assert tr_df.equals(pd.read_csv('./test_files/transaction1_df.csv'))
+
+
+'''
+Test Cases for read_transaction_json_files function (parallel partitions)
+'''
+def test_read_transaction_json_files_parallel():
+    params = {'transactions_location': './input_data/starter/transactions/'}
+    transaction_dirs = sorted(['d=2018-12-01', 'd=2018-12-02', 'd=2018-12-03'])
+    serial_df = solution_start.read_transaction_json_files(transaction_dirs, params)
+    parallel_df = solution_start.read_transaction_json_files(transaction_dirs, dict(params, workers=2))
+    assert parallel_df.equals(serial_df)
+    assert solution_start.read_transaction_json_files(transaction_dirs, dict(params, mmap=True)).equals(serial_df)
+
+
+'''
+Test Cases for iter_prefetched_partitions function (slow storage stand-in)
+'''
+@pytest.mark.parametrize('prefetch', [1, 2, 8])
+def test_iter_prefetched_partitions(prefetch : int):
+    params = {'transactions_location': './input_data/starter/transactions/', 'prefetch': prefetch}
+    transaction_dirs = ['d=2018-12-01', 'd=2018-12-02', 'd=2018-12-03', 'd=2018-12-04']
+    opener = SlowFileLayer(0.01)
+    chunks = list(solution_start.iter_prefetched_partitions(transaction_dirs, params, opener))
+    assert opener.opened == 4
+    assert pd.concat(chunks, ignore_index=True).equals(solution_start.read_transaction_json_files(transaction_dirs, {'transactions_location': params['transactions_location']}))
+
+
+'''
+Test Cases for separate_column_elements function (empty basket)
+'''
+def test_separate_column_elements_empty_basket():
+    transaction_raw_df = pd.DataFrame({
+        'customer_id': ['C1', 'C2'],
+        'basket': [[], [{'product_id': 'P07', 'price': 156}]],
+        'date_of_purchase': ['2018-12-01 15:50:00', '2018-12-01 12:31:00']
+    })
+    tr_df = solution_start.separate_column_elements(transaction_raw_df)
+    assert list(tr_df['customer_id']) == ['C1', 'C2']
+    assert pd.isna(tr_df['product_id'][0]) and tr_df['product_id'][1] == 'P07'
+    assert pd.isna(tr_df['price'][0]) and tr_df['price'][1] == 156
+
+
+'''
+Test Cases for segregate_weekly_incremental function
+'''
+def test_segregate_weekly_incremental(tmp_path):
+    transactions = tmp_path / 'transactions'
+    output = tmp_path / 'outputs'
+    shutil.copy('./input_data/starter/customers.csv', tmp_path / 'customers.csv')
+    params = {
+        'customers_location': str(tmp_path / 'customers.csv'),
+        'products_location': './input_data/starter/products.csv',
+        'transactions_location': str(transactions) + '/',
+        'output_location': str(output) + '/'
+    }
+    customer_df, product_df = solution_start.read_csv_files(params)
+
+    def add_days(first_day : int, last_day : int):
+        for day in range(first_day, last_day + 1):
+            shutil.copytree('./input_data/starter/transactions/d=2018-12-%02d' % day, transactions / ('d=2018-12-%02d' % day))
+
+    # first delivery: Saturday 2018-12-01 to Sunday 2018-12-09
+    add_days(1, 9)
+    written = solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), params)
+    assert sorted(written) == ['Week_2018-12-02.json', 'Week_2018-12-09.json']
+    modified = {name: os.stat(output / name).st_mtime_ns for name in written}
+
+    # re-running without new data rewrites nothing, even with a touched but unchanged customers file
+    assert solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), params) == []
+    os.utime(tmp_path / 'customers.csv', ns=(0, 0))
+    assert solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), params) == []
+
+    # next weekly delivery: Monday 2018-12-10 to Sunday 2018-12-16
+    add_days(10, 16)
+    written = solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), params)
+    assert written == ['Week_2018-12-16.json']
+    assert sorted(name for name in os.listdir(output) if name.startswith('Week_')) == ['Week_2018-12-02.json', 'Week_2018-12-09.json', 'Week_2018-12-16.json']
+    assert {name: os.stat(output / name).st_mtime_ns for name in modified} == modified
+
+    # a flag changing the content of the files rewrites every week
+    written = solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), dict(params, compact_json=True))
+    assert sorted(written) == ['Week_2018-12-02.json', 'Week_2018-12-09.json', 'Week_2018-12-16.json']
+    assert all(b'\n' not in (output / name).read_bytes() for name in written)
+    assert solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), dict(params, compact_json=True)) == []
+
+
+def test_segregate_weekly_incremental_late_row(tmp_path):
+    transactions = tmp_path / 'transactions'
+    output = tmp_path / 'outputs'
+    params = {
+        'customers_location': './input_data/starter/customers.csv',
+        'products_location': './input_data/starter/products.csv',
+        'transactions_location': str(transactions) + '/',
+        'output_location': str(output) + '/'
+    }
+    customer_df, product_df = solution_start.read_csv_files(params)
+    for day in range(1, 10):
+        shutil.copytree('./input_data/starter/transactions/d=2018-12-%02d' % day, transactions / ('d=2018-12-%02d' % day))
+    solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), params)
+    written = {name: (output / name).read_bytes() for name in ['Week_2018-12-02.json', 'Week_2018-12-09.json']}
+
+    # a new partition holding a row dated in the previous week, the row stays in the week of its partition
+    (transactions / 'd=2018-12-10').mkdir()
+    (transactions / 'd=2018-12-10' / 'transactions.json').write_text(
+        '{"customer_id": "C1", "basket": [{"product_id": "P01", "price": 10}], "date_of_purchase": "2018-12-08 23:59:00"}\n')
+    assert solution_start.segregate_weekly_incremental(customer_df, product_df, os.listdir(transactions), params) == ['Week_2018-12-10.json']
+    assert {name: (output / name).read_bytes() for name in written} == written
+    with open(output / 'Week_2018-12-10.json') as f:
+        assert list(json.load(f)) == ['C1']
+
+
+'''
+Test Cases for read_cached_partition function
+'''
+def test_read_cached_partition(tmp_path):
+    transactions = tmp_path / 'transactions'
+    shutil.copytree('./input_data/starter/transactions/d=2018-12-01', transactions / 'd=2018-12-01')
+    params = {'transactions_location': str(transactions) + '/', 'cache_location': str(tmp_path / 'cache')}
+
+    cached_df = solution_start.read_cached_partition('d=2018-12-01', params)
+    assert (tmp_path / 'cache' / 'd=2018-12-01' / 'transactions.parquet').exists()
+    assert str(cached_df['date_of_purchase'].dtype).startswith('datetime64')
+    assert len(cached_df) == len(solution_start.read_transaction_json_files(['d=2018-12-01'], {'transactions_location': params['transactions_location']}))
+
+    # column projection and date predicate
+    projected_df = solution_start.read_cached_partition('d=2018-12-01', params, columns=['customer_id', 'price'], start_date='2018-12-01 12:00:00')
+    assert list(projected_df.columns) == ['customer_id', 'price']
+    assert len(projected_df) == (cached_df['date_of_purchase'] >= pd.Timestamp('2018-12-01 12:00:00')).sum()
+
+    # a changed source file is parsed again
+    with open(transactions / 'd=2018-12-01' / 'transactions.json', 'a') as f:
+        f.write('{"customer_id": "C1", "basket": [{"product_id": "P01", "price": 5}], "date_of_purchase": "2018-12-01 23:00:00"}\n')
+    assert len(solution_start.read_cached_partition('d=2018-12-01', params)) == len(cached_df) + 1
+
+    # invalid values are cached as NaT/NaN for the validation, a date without time is kept at midnight
+    with open(transactions / 'd=2018-12-01' / 'transactions.json', 'a') as f:
+        f.write('{"customer_id": "C1", "basket": [{"product_id": "P01", "price": "abc"}], "date_of_purchase": "2018-12-01"}\n')
+        f.write('{"customer_id": "C1", "basket": [{"product_id": "P01", "price": 5}], "date_of_purchase": "01/12/2018"}\n')
+    tail_df = solution_start.read_cached_partition('d=2018-12-01', params).tail(2)
+    assert list(tail_df['date_of_purchase']) == [pd.Timestamp('2018-12-01'), pd.NaT]
+    assert pd.isna(tail_df['price'].iloc[0]) and tail_df['price'].iloc[1] == 5
+
+
+'''
+Test Cases for encode_frames function
+'''
+def test_encode_frames():
+    product_df = pd.read_csv('./test_files/product1_df.csv')
+    customer_df = pd.read_csv('./test_files/customer1_df.csv')
+    transaction_df = pd.read_csv('./test_files/transaction1_df.csv')
+    product_df, customer_df, transaction_df = solution_start.encode_frames(product_df, customer_df, transaction_df)
+    assert transaction_df['customer_id'].dtype == customer_df['customer_id'].dtype == 'category'
+    assert transaction_df['product_id'].dtype == product_df['product_id'].dtype
+    df = solution_start.merge_dataframes(product_df, customer_df, transaction_df)
+    assert df['product_category'].dtype == 'category'
+    final_df = pd.read_csv('./test_files/final_df.csv')
+    assert df.astype(str).equals(final_df.astype(str))
+
+
+'''
+Test Cases for DimensionLookup class (unmatched keys)
+'''
+def test_dimension_lookup_unmatched():
+    customer_df = pd.read_csv('./test_files/customer1_df.csv')
+    transaction_df = pd.DataFrame({'customer_id': ['C1', 'C99', 'C2', 'C99']})
+    lookup = solution_start.DimensionLookup(customer_df, 'customer_id', ['loyalty_score'])
+    df = lookup.attach(transaction_df)
+    assert list(df['loyalty_score'][[0, 2]]) == [7, 4]
+    assert df['loyalty_score'][[1, 3]].isna().all()
+    assert lookup.unmatched == {'C99': 2}
+
+
+'''
+Test Cases for segregate_weekly function
+'''
+def test_segregate_weekly_unsorted_labels(tmp_path):
+    # label 0 is not the earliest row, the Monday row (label 1) must still be in the first week
+    final_df = pd.DataFrame({
+        'customer_id': ['C1', 'C2', 'C1', 'C2'],
+        'date_of_purchase': ['2018-12-05 10:00:00', '2018-12-03 09:00:00', '2018-12-09 18:00:00', '2018-12-11 08:00:00'],
+        'product_id': ['P01', 'P02', 'P03', 'P04'],
+        'price': [10, 20, 30, 40],
+        'product_category': ['house', 'house', 'food', 'food'],
+        'loyalty_score': [7, 4, 7, 4]
+    })
+    solution_start.segregate_weekly(final_df, {'output_location': str(tmp_path) + '/'})
+    assert sorted(os.listdir(tmp_path)) == ['Week_2018-12-09.json', 'Week_2018-12-11.json']
+    with open(tmp_path / 'Week_2018-12-09.json') as f:
+        assert list(json.load(f)) == ['C1', 'C2']
+    with open(tmp_path / 'Week_2018-12-11.json') as f:
+        assert list(json.load(f)) == ['C2']
+
+
+@pytest.mark.parametrize('mode', [{'chunk_size': 50}, {'incremental': True}])
+def test_segregate_weekly_matches_streaming(tmp_path, mode : dict):
+    # every path keeps the rows of a date in file order, so the first row of a customer is the same
+    params = {
+        'customers_location': './input_data/starter/customers.csv',
+        'products_location': './input_data/starter/products.csv',
+        'transactions_location': './input_data/starter/transactions/'
+    }
+    solution_start.run_pandas_engine(dict(params, output_location=str(tmp_path / 'in_memory') + '/'))
+    solution_start.run_pandas_engine(dict(params, **mode, output_location=str(tmp_path / 'streaming') + '/'))
+
+    weeks = sorted(name for name in os.listdir(tmp_path / 'in_memory') if name.startswith('Week_'))
+    assert weeks == sorted(name for name in os.listdir(tmp_path / 'streaming') if name.startswith('Week_'))
+    for name in weeks:
+        assert (tmp_path / 'streaming' / name).read_bytes() == (tmp_path / 'in_memory' / name).read_bytes()
+
+
+@pytest.mark.parametrize('dates, weeks',
+            [
+                (['2018-12-01', '2018-12-02', '2018-12-05', '2018-12-09', '2018-12-10'], ['2018-12-02', '2018-12-02', '2018-12-09', '2018-12-09', '2018-12-10']),   # Test Case 1
+                (['2018-12-03', '2018-12-12', '2018-12-16'], ['2018-12-16', '2018-12-16', '2018-12-16'])                                                              # Test Case 2 (no data on Sunday 2018-12-09)
+            ])
+def test_week_ending_dates(dates : list, weeks : list):
+    dates = pd.Series(pd.to_datetime(dates))
+    sundays = dates[dates.dt.dayofweek == 6].unique()
+    week_ending = solution_start.week_ending_dates(dates, sundays, dates.max())
+    assert list(week_ending.dt.strftime('%Y-%m-%d')) == weeks
+
+
+'''
+Test Cases for write_json_output function
+'''
+@pytest.mark.parametrize('output_dict',
+            [
+                {},                                                                                                                 # Test Case 1
+                {'C1': {'purchase_count': 1, 'loyalty_score': 7, 'product_id': ['P40'], 'product_category': ['sweets']},
+                 'C3': {'purchase_count': 0, 'loyalty_score': 8, 'product_id': [], 'product_category': []}}                       # Test Case 2
+            ])
+def test_write_json_output(tmp_path, output_dict : dict):
+    # default layout is byte-identical to json.dump(indent=4)
+    solution_start.write_json_output(iter(output_dict.items()), str(tmp_path / 'pretty.json'), {})
+    assert (tmp_path / 'pretty.json').read_text(encoding='utf-8') == json.dumps(output_dict, ensure_ascii=False, indent=4)
+
+    solution_start.write_json_output(iter(output_dict.items()), str(tmp_path / 'compact.json.gz'), {'compact_json': True, 'json_encoder': 'auto', 'gzip_output': True})
+    with gzip.open(tmp_path / 'compact.json.gz', 'rt', encoding='utf-8') as f:
+        assert json.load(f) == output_dict
+
+
+def test_aggregate_customers_missing_values(tmp_path):
+    final_df = pd.DataFrame({
+        'customer_id': ['C10', 'C2', 'C10', 'C2'],
+        'product_id': ['P01', 'P02', 'P03', 'P04'],
+        'product_category': ['food', 'house', np.nan, 'food'],
+        'loyalty_score': [7.0, np.nan, 7.0, np.nan]
+    })
+    records = solution_start.aggregate_customers(final_df)
+    assert not isinstance(records, (list, dict))
+    records = list(records)
+    assert records == [
+        ('C2', {'purchase_count': 1, 'loyalty_score': None, 'product_id': ['P04'], 'product_category': ['food']}),
+        ('C10', {'purchase_count': 1, 'loyalty_score': 7.0, 'product_id': ['P03'], 'product_category': [None]})
+    ]
+
+    # missing values are written as null whatever the encoder
+    outputs = []
+    for encoder in ['json', 'orjson']:
+        solution_start.write_json_output(iter(records), str(tmp_path / (encoder + '.json')), {'compact_json': True, 'json_encoder': encoder})
+        outputs.append((tmp_path / (encoder + '.json')).read_bytes())
+    assert outputs[0] == outputs[1] and b'null' in outputs[0]
+
+
+'''
+Test Cases for generate_json function (output formats)
+'''
+@pytest.mark.parametrize('output_format, file_name',
+            [
+                ('json', 'Week_2018-12-02.json'),          # Test Case 1
+                ('jsonl', 'Week_2018-12-02.jsonl'),        # Test Case 2
+                ('parquet', 'Week_2018-12-02.parquet')     # Test Case 3
+            ])
+def test_generate_json_output_formats(tmp_path, output_format : str, file_name : str):
+    final_df = pd.read_csv('./test_files/final_df.csv')
+    solution_start.generate_json(final_df, '2018-12-02 00:00:00', {'output_location': str(tmp_path) + '/', 'output_format': output_format})
+    assert os.listdir(tmp_path) == [file_name]
+    if output_format == 'json':
+        with open(tmp_path / file_name) as f:
+            records = [dict({'customer_id': customer}, **record) for customer, record in json.load(f).items()]
+    elif output_format == 'jsonl':
+        with open(tmp_path / file_name) as f:
+            records = [json.loads(line) for line in f]
+    else:
+        records = [dict(row, product_id=list(row['product_id']), product_category=list(row['product_category']))
+                   for row in pd.read_parquet(tmp_path / file_name).to_dict('records')]
+    assert records == [
+        {'customer_id': 'C1', 'purchase_count': 1, 'loyalty_score': 7, 'product_id': ['P36'], 'product_category': ['sweets']},
+        {'customer_id': 'C2', 'purchase_count': 1, 'loyalty_score': 4, 'product_id': ['P12'], 'product_category': ['house']}
+    ]
+
+
+'''
+Test Cases for run_spark_engine function (same weekly outputs as the pandas engine)
+'''
+def test_spark_engine_matches_pandas(tmp_path, monkeypatch):
+    pytest.importorskip('pyspark')
+    if shutil.which('java') is None:
+        pytest.skip('java is required by pyspark')
+
+    for day in range(1, 11):
+        shutil.copytree('./input_data/starter/transactions/d=2018-12-%02d' % day, tmp_path / 'transactions' / ('d=2018-12-%02d' % day))
+    # rows failing every check of validate_transactions() (an unparsable line, a basket that is not a list, an empty basket,
+    # unknown ids, invalid date and price) next to valid ones, those of d=2018-12-10 dated into the week before
+    lines = [
+        '{"customer_id": "C2", "basket": [{"product_id": "P07", "price": 156',
+        '{"customer_id": "C1", "basket": "oops", "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "C2", "basket": [], "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "", "basket": [{"product_id": "P07", "price": 156}], "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "C999", "basket": [{"product_id": "P07", "price": 156}], "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "C2", "basket": [{"product_id": "P99", "price": 10}, {"product_id": "P12", "price": 1266}], "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "C1", "basket": [{"product_id": "P12", "price": 10}], "date_of_purchase": "03/12/2018"}',
+        '{"customer_id": "C1", "basket": [{"price": 10}], "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "C1", "basket": [{"product_id": "P36", "price": "abc"}, {"product_id": "P36", "price": -1}], "date_of_purchase": "2018-12-03 12:31:00"}',
+        '{"customer_id": "C2", "basket": [{"product_id": "P07", "price": 156}], "date_of_purchase": "2018-12-03"}'
+    ]
+    for day in ['d=2018-12-03', 'd=2018-12-10']:
+        with open(tmp_path / 'transactions' / day / 'transactions.json', 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+    params = {
+        'customers_location': './input_data/starter/customers.csv',
+        'products_location': './input_data/starter/products.csv',
+        'transactions_location': str(tmp_path / 'transactions') + '/'
+    }
+
+    # the streaming pandas path keeps rows of a day in file order, like the spark engine
+    counts = {}
+    for engine, run in [('pandas', lambda params: solution_start.run_pandas_engine(dict(params, chunk_size=1000))),
+                        ('spark', lambda params: solution_start.run_spark_engine(dict(params, spark_master='local[2]')))]:
+        quarantine = solution_start.Quarantine()
+        monkeypatch.setattr(solution_start, 'quarantine', quarantine)
+        run(dict(params, output_location=str(tmp_path / engine) + '/'))
+        counts[engine] = quarantine.counts
+
+    assert counts['spark'] == counts['pandas'] == {'malformed_json': 2, 'malformed_basket': 2, 'empty_basket': 2, 'missing_customer_id': 2,
+                                                   'unknown_customer': 2, 'unknown_product': 2, 'invalid_date': 2, 'missing_product_id': 2, 'invalid_price': 4}
+    assert sorted(os.listdir(tmp_path / 'spark')) == sorted(os.listdir(tmp_path / 'pandas'))
+    for name in os.listdir(tmp_path / 'pandas'):
+        assert (tmp_path / 'spark' / name).read_bytes() == (tmp_path / 'pandas' / name).read_bytes()
+
+
+'''
+Test Cases for list_transaction_dirs function
+'''
+@pytest.mark.parametrize('window, transaction_dirs',
+            [
+                ({}, ['d=2018-12-02', 'd=2018-12-03', 'd=2018-12-10', 'd=2018-12-16']),                                           # Test Case 1
+                ({'start_date': '2018-12-03', 'end_date': '2018-12-10'}, ['d=2018-12-03', 'd=2018-12-10']),                       # Test Case 2
+                ({'weeks': 1}, ['d=2018-12-10', 'd=2018-12-16']),                                                                 # Test Case 3
+                ({'weeks': 2, 'start_date': '2018-12-10'}, ['d=2018-12-10', 'd=2018-12-16']),                                     # Test Case 4
+                ({'weeks': 1, 'end_date': '2018-12-09'}, ['d=2018-12-03']),                                                       # Test Case 5
+                ({'weeks': 2, 'end_date': '2018-12-12'}, ['d=2018-12-03', 'd=2018-12-10'])                                        # Test Case 6
+            ])
+def test_list_transaction_dirs(tmp_path, window : dict, transaction_dirs : list):
+    for transaction in ['d=2018-12-16', 'd=2018-12-02', 'd=2018-12-10', 'd=2018-12-03', 'd=2018-12-04', 'd=2018-13-01', 'stray']:
+        (tmp_path / transaction).mkdir()
+        if transaction != 'd=2018-12-04':
+            (tmp_path / transaction / 'transactions.json').write_text('')
+    (tmp_path / '_SUCCESS').write_text('')
+    assert solution_start.list_transaction_dirs(dict(window, transactions_location=str(tmp_path) + '/')) == transaction_dirs
+
+
+'''
+Test Cases for instrument decorator and RunReport class
+'''
+def test_run_report(tmp_path, monkeypatch):
+    report = solution_start.RunReport({'output_location': str(tmp_path) + '/'})
+    monkeypatch.setattr(solution_start, 'run_report', report)
+    final_df = solution_start.prepare_final_df(pd.read_csv('./test_files/product1_df.csv'), pd.read_csv('./test_files/customer1_df.csv'), pd.read_csv('./test_files/transaction1_df.csv'), {})
+    solution_start.generate_json(final_df, '2018-12-02 00:00:00', {'output_location': str(tmp_path) + '/'})
+
+    # validation is recorded inside the merge stage, generate_json per week, rows_in only counts the transactions
+    assert [stage['stage'] for stage in report.stages] == ['validate_transactions', 'merge_dataframes', 'generate_json']
+    assert [stage['rows_in'] for stage in report.stages] == [4, 4, 4]
+    assert report.stages[2]['label'] == '2018-12-02'
+
+    # the peak of a stage is kept after the memory it allocated is released
+    @solution_start.instrument('allocate')
+    def allocate():
+        return float(np.ones(16 * 1024 * 1024).sum())
+    allocate()
+    assert report.stages[-1]['peak_rss_mb'] >= report.stages[-1]['rss_mb'] + 100
+
+    report.write(str(tmp_path / '_run_report.json'))
+    with open(tmp_path / '_run_report.json') as f:
+        written = json.load(f)
+    assert written['params'] == {'output_location': str(tmp_path) + '/'}
+    assert set(written['stages'][0]) >= {'wall_seconds', 'cpu_seconds', 'rows_in', 'rows_out', 'rss_mb', 'peak_rss_mb'}
+    assert written['max_rss_mb'] >= report.stages[-1]['peak_rss_mb']
+
+
+'''
+Test Cases for the vectorized data generator
+'''
+def test_generate_transactions_vectorized(tmp_path):
+    products = {'food': ['milk', 'oats'], 'bws': ['gin']}
+    outputs = []
+    for run in ['a', 'b']:
+        (tmp_path / run).mkdir()
+        product_id_lookup = data_generator.generate_products(str(tmp_path / run), products)
+        data_generator.generate_transactions_vectorized(str(tmp_path / run), 50, products, product_id_lookup, ['food', 'bws'],
+                                                        datetime(2018, 12, 1), datetime(2018, 12, 16, 23, 59, 59), seed=7)
+        outputs.append(solution_start.read_transaction_json_files(sorted(os.listdir(tmp_path / run / 'transactions')),
+                                                                  {'transactions_location': str(tmp_path / run / 'transactions') + '/'}))
+
+    # one partition per day, the same rows for the same seed, and only known customers and products
+    assert sorted(os.listdir(tmp_path / 'a' / 'transactions'))[0] == 'd=2018-12-01' and len(os.listdir(tmp_path / 'a' / 'transactions')) == 16
+    pd.testing.assert_frame_equal(outputs[0], outputs[1])
+    assert len(outputs[0]) > 0
+    assert set(outputs[0]['product_id']) <= {'P1', 'P2', 'P3'}
+    assert outputs[0]['customer_id'].str[1:].astype(int).between(1, 50).all()
+
+
+'''
+Test Cases for the benchmark suite regression check
+'''
+def test_find_regressions():
+    baseline = {'small': {'wall_seconds': 10.0, 'transactions_per_second': 1000.0, 'max_rss_mb': 100.0,
+                          'stages': {'generate_json': {'wall_seconds': 4.0}, 'read_csv_files': {'wall_seconds': 0.01}}}}
+    results = {'small': {'wall_seconds': 11.0, 'transactions_per_second': 900.0, 'max_rss_mb': 130.0,
+                         'stages': {'generate_json': {'wall_seconds': 6.0}, 'read_csv_files': {'wall_seconds': 0.05}}},
+               'large': {'wall_seconds': 99.0, 'transactions_per_second': 1.0, 'max_rss_mb': 1.0, 'stages': {}}}
+
+    # memory and generate_json are over 20%, stages too short in the baseline and tiers without one are not compared
+    regressions = suite.find_regressions(results, baseline, 0.2)
+    assert [regression.split(':')[0] for regression in regressions] == ['small max_rss_mb', 'small generate_json wall_seconds']
+    assert suite.find_regressions(results, baseline, 0.6) == []
+
+
+'''
+Test Cases for the aggregate store and rolling_aggregates function
+'''
+def test_rolling_aggregates(tmp_path):
+    final_df = pd.DataFrame({
+        'customer_id': ['C1', 'C1', 'C2', 'C1', 'C2'],
+        'date_of_purchase': ['2018-12-03 10:00:00', '2018-12-03 10:00:00', '2018-12-04 09:00:00', '2018-12-09 18:00:00', '2018-12-16 08:00:00'],
+        'product_id': ['P01', 'P02', 'P01', 'P01', 'P03'],
+        'price': [10, 20, 30, 40, 50],
+        'product_category': ['house', 'food', 'house', 'house', 'bws'],
+        'loyalty_score': [7, 7, 4, 7, 4]
+    })
+    params = {'output_location': str(tmp_path / 'outputs') + '/', 'aggregate_location': str(tmp_path / 'aggregates')}
+    solution_start.segregate_weekly(final_df, params)
+    assert sorted(os.listdir(tmp_path / 'aggregates')) == ['week=2018-12-09.parquet', 'week=2018-12-16.parquet']
+
+    # every item is counted, including the first row of a customer
+    last_two = solution_start.rolling_aggregates(params['aggregate_location'], 2, level='category')
+    assert last_two.to_dict('records') == [
+        {'customer_id': 'C1', 'product_category': 'food', 'purchase_count': 1, 'spend': 20.0, 'weeks_active': 1},
+        {'customer_id': 'C1', 'product_category': 'house', 'purchase_count': 2, 'spend': 50.0, 'weeks_active': 1},
+        {'customer_id': 'C2', 'product_category': 'bws', 'purchase_count': 1, 'spend': 50.0, 'weeks_active': 1},
+        {'customer_id': 'C2', 'product_category': 'house', 'purchase_count': 1, 'spend': 30.0, 'weeks_active': 1}
+    ]
+    last_week = solution_start.rolling_aggregates(params['aggregate_location'], 1, level='customer', customer_ids=['C2'])
+    assert last_week.to_dict('records') == [{'customer_id': 'C2', 'purchase_count': 1, 'spend': 50.0, 'weeks_active': 1}]
+    assert solution_start.rolling_aggregates(params['aggregate_location'], 4, end_week='2018-12-02').empty
+
+
+def test_aggregate_store_extended_week(tmp_path):
+    final_df = pd.DataFrame({
+        'customer_id': ['C1', 'C1', 'C1', 'C1'],
+        'date_of_purchase': ['2018-12-09 10:00:00', '2018-12-11 10:00:00', '2018-12-13 09:00:00', '2018-12-16 18:00:00'],
+        'product_id': ['P01', 'P02', 'P03', 'P04'],
+        'price': [10, 20, 30, 40],
+        'product_category': ['house', 'food', 'house', 'bws'],
+        'loyalty_score': [7, 7, 7, 7]
+    })
+    params = {'output_location': str(tmp_path / 'outputs') + '/', 'aggregate_location': str(tmp_path / 'aggregates')}
+
+    # a run up to Thursday 2018-12-13 stores a partial week, the next one extends it to Sunday 2018-12-16
+    solution_start.segregate_weekly(final_df[:3].copy(), params)
+    assert sorted(os.listdir(tmp_path / 'aggregates')) == ['week=2018-12-09.parquet', 'week=2018-12-13.parquet']
+    solution_start.segregate_weekly(final_df.copy(), params)
+    assert sorted(os.listdir(tmp_path / 'aggregates')) == ['week=2018-12-09.parquet', 'week=2018-12-16.parquet']
+
+    window = solution_start.rolling_aggregates(params['aggregate_location'], 4, level='customer')
+    assert window.to_dict('records') == [{'customer_id': 'C1', 'purchase_count': 4, 'spend': 100.0, 'weeks_active': 2}]
+
+
+'''
+Test Cases for validate_transactions function and the quarantine
+'''
+@pytest.mark.parametrize('params', [{}, {'workers': 2}, {'compact_types': True}])
+def test_validate_transactions(tmp_path, monkeypatch, params : dict):
+    lines = [
+        '{"customer_id": "C1", "basket": [{"product_id": "P40", "price": 1876}, {"product_id": "P36", "price": 1065}], "date_of_purchase": "2018-12-01 15:50:00"}',
+        '{"customer_id": "C2", "basket": [{"product_id": "P07", "price": 156',
+        '[1, 2]',
+        '{"customer_id": "C2", "basket": [], "date_of_purchase": "2018-12-01 12:31:00"}',
+        '{"customer_id": "C99", "basket": [{"product_id": "P07", "price": 156}], "date_of_purchase": "2018-12-01 12:31:00"}',
+        '{"customer_id": "C2", "basket": [{"product_id": "P99", "price": 10}, {"product_id": "P12", "price": 1266}], "date_of_purchase": "2018-12-01 12:31:00"}',
+        '{"customer_id": "C1", "basket": [{"product_id": "P12", "price": 10}], "date_of_purchase": "01/12/2018"}',
+        '{"customer_id": "C1", "basket": "oops", "date_of_purchase": "2018-12-01 12:31:00"}',
+        '{"customer_id": "C1", "basket": [{"product_id": "P36", "price": "abc"}], "date_of_purchase": "2018-12-01 12:31:00"}',
+        '{"customer_id": "C2", "basket": [{"product_id": "P07", "price": 156}], "date_of_purchase": "2018-12-01"}'
+    ]
+    for transaction in ['d=2018-12-01', 'd=2018-12-02']:
+        (tmp_path / transaction).mkdir()
+        (tmp_path / transaction / 'transactions.json').write_text('\n'.join(lines) + '\n')
+    quarantine = solution_start.Quarantine()
+    monkeypatch.setattr(solution_start, 'quarantine', quarantine)
+
+    transaction_df = solution_start.read_transaction_json_files(['d=2018-12-01', 'd=2018-12-02'], dict(params, transactions_location=str(tmp_path) + '/'))
+    final_df = solution_start.prepare_final_df(pd.read_csv('./test_files/product1_df.csv'), pd.read_csv('./test_files/customer1_df.csv'), transaction_df, params)
+
+    # both partitions keep their four valid rows (a date without time is valid), everything else is quarantined with its reason
+    assert list(final_df['product_id'].astype(str)) == ['P40', 'P36', 'P12', 'P07'] * 2
+    assert pd.api.types.is_integer_dtype(final_df['loyalty_score'])
+    assert quarantine.counts == {'malformed_json': 2, 'not_an_object': 2, 'malformed_basket': 2, 'invalid_date': 2, 'empty_basket': 2,
+                                 'invalid_price': 2, 'unknown_customer': 2, 'unknown_product': 2}
+    assert [record['basket'] for record in quarantine.records if record['reason'] == 'malformed_basket'] == ['oops'] * 2
+
+    # quarantined records keep the values read, whatever the mode
+    rejected = {record['reason']: record for record in quarantine.records}
+    assert rejected['invalid_date']['date_of_purchase'] == '01/12/2018'
+    assert rejected['invalid_price']['price'] == 'abc'
+    assert [(record['customer_id'], record['product_id']) for record in quarantine.records if record['reason'] == 'unknown_customer'] == [('C99', 'P07')] * 2
+
+    quarantine.write(str(tmp_path / '_quarantine.json'))
+    with open(tmp_path / '_quarantine.json') as f:
+        assert len(json.load(f)['records']) == 16
+
+
+def test_read_csv_files_missing_file(tmp_path):
+    with pytest.raises(IOError):
+        solution_start.read_csv_files({'customers_location': str(tmp_path / 'customers.csv'), 'products_location': './test_files/product1_df.csv'})